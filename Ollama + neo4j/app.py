@@ -3,22 +3,29 @@ import json
 import asyncio
 import time
 import hashlib
+import threading
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from typing import List
-from modules.ollama_helper import ask_llama
+from modules.ollama_helper import ask_llama, llm_scheduler
 from modules.graph_summary import render_classification_tables, summarize_with_llama
 
 from flask import (
-    Flask, jsonify, render_template, request,
+    Flask, Response, jsonify, render_template, request,
     redirect, url_for, send_from_directory, session
 )
 import fitz  # PyMuPDF
-from langdetect import detect
 from werkzeug.utils import secure_filename
 
-from neo4j import GraphDatabase
+from modules.neo4j_driver import Neo4jDriverManager
 from modules.neo4j_handler import Neo4jHandler
+from modules.retrieval import neo4j_related
+from modules.similarity import DocumentSimilarity
 from modules import metadata_extractors  # async enrich_text(text, page_count)
+from modules import pdf_stream
+from modules import metadata_store
+from modules.near_duplicates import LSHIndex
 
 # -----------------------------
 # App config
@@ -26,25 +33,78 @@ from modules import metadata_extractors  # async enrich_text(text, page_count)
 app = Flask(__name__)
 app.secret_key = "change-this-secret-key"
 
-# Hardcoded paths
+# Data paths (APP_DATA_DIR points a test or load-test run at a scratch copy)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-METADATA_DIR = os.path.join(BASE_DIR, "metadata")
-SITEMAP_DIR = os.path.join(BASE_DIR, "sitemaps")
-UPLOADS_DIR = os.path.join(BASE_DIR, "uploads")           # for admin uploads
-USER_RFP_DIR = os.path.join(BASE_DIR, "user_rfp_uploads") # for user uploads
+DATA_DIR = os.environ.get("APP_DATA_DIR", BASE_DIR)
+METADATA_DIR = os.path.join(DATA_DIR, "metadata")
+SITEMAP_DIR = os.path.join(DATA_DIR, "sitemaps")
+UPLOADS_DIR = os.path.join(DATA_DIR, "uploads")           # for admin uploads
+USER_RFP_DIR = os.path.join(DATA_DIR, "user_rfp_uploads") # for user uploads
 
 os.makedirs(METADATA_DIR, exist_ok=True)
 os.makedirs(SITEMAP_DIR, exist_ok=True)
 os.makedirs(UPLOADS_DIR, exist_ok=True)
 os.makedirs(USER_RFP_DIR, exist_ok=True)
 
-# Hardcoded Neo4j credentials
-NEO4J_URI = "bolt://localhost:7687"
-NEO4J_USER = "neo4j"
-NEO4J_PASSWORD = "graph@123"
-
-driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
-handler = Neo4jHandler(driver)
+# Corpus metadata and sitemap are JSON Lines (see modules/metadata_store.py);
+# older indent=2 JSON files are converted on startup.
+METADATA_PATH = os.path.join(METADATA_DIR, "metadata.jsonl")
+SITEMAP_PATH = os.path.join(SITEMAP_DIR, "sitemap.jsonl")
+metadata_store.migrate_json(os.path.join(METADATA_DIR, "metadata.json"), METADATA_PATH)
+metadata_store.migrate_json(os.path.join(SITEMAP_DIR, "sitemap.json"), SITEMAP_PATH)
+
+# Neo4j credentials. The neo4j:// scheme lets the driver route read
+# transactions to followers/read replicas in a cluster (and still works
+# against a single server); bolt:// pins every session to one host.
+NEO4J_URI = os.environ.get("NEO4J_URI", "neo4j://localhost:7687")
+NEO4J_USER = os.environ.get("NEO4J_USER", "neo4j")
+NEO4J_PASSWORD = os.environ.get("NEO4J_PASSWORD", "graph@123")
+
+# Connection pool (one driver per process, shared by all requests)
+NEO4J_MAX_POOL_SIZE = int(os.environ.get("NEO4J_MAX_POOL_SIZE", 50))
+NEO4J_ACQUISITION_TIMEOUT = float(os.environ.get("NEO4J_ACQUISITION_TIMEOUT", 30))
+NEO4J_MAX_CONNECTION_LIFETIME = float(os.environ.get("NEO4J_MAX_CONNECTION_LIFETIME", 3600))
+
+db = Neo4jDriverManager(
+    NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD,
+    max_pool_size=NEO4J_MAX_POOL_SIZE,
+    acquisition_timeout=NEO4J_ACQUISITION_TIMEOUT,
+    max_connection_lifetime=NEO4J_MAX_CONNECTION_LIFETIME
+)
+handler = Neo4jHandler(db)
+similarity = DocumentSimilarity(db)
+
+# Large-PDF processing: text buffered per document is capped by
+# MAX_DOC_MEMORY_CHARS; documents above PARALLEL_PAGE_THRESHOLD pages are
+# split into PAGES_PER_RANGE chunks across EXTRACTION_WORKERS processes.
+MAX_DOC_MEMORY_CHARS = int(os.environ.get("MAX_DOC_MEMORY_CHARS", 400_000))
+PARALLEL_PAGE_THRESHOLD = int(os.environ.get("PARALLEL_PAGE_THRESHOLD", 150))
+PAGES_PER_RANGE = int(os.environ.get("PAGES_PER_RANGE", 50))
+EXTRACTION_WORKERS = int(os.environ.get("EXTRACTION_WORKERS", pdf_stream.MAX_WORKERS))
+# Fast-tier enrichment, language detection and near-duplicate scans run in
+# the process pool instead of a thread (asgi.py turns this on so they do
+# not hold the event loop's GIL)
+OFFLOAD_CPU_WORK = os.environ.get("OFFLOAD_CPU_WORK", "0") == "1"
+
+# Enrichment tiers: "fast" samples pages within a time budget, "full" reads
+# everything. Fast-tier docs are upgraded to full in the background.
+ENRICHMENT_TIERS = ("fast", "full")
+INGEST_TIER = os.environ.get("INGEST_TIER", "full")
+UPLOAD_TIER = os.environ.get("UPLOAD_TIER", "fast")
+FAST_TIER_BUDGET_SEC = float(os.environ.get("FAST_TIER_BUDGET_SEC", 3.0))
+FULL_TIER_WORKERS = int(os.environ.get("FULL_TIER_WORKERS", 1))
+# Upgraded records are written back this many at a time (one file rewrite each)
+FULL_TIER_SAVE_BATCH = int(os.environ.get("FULL_TIER_SAVE_BATCH", 20))
+
+full_tier_executor = ThreadPoolExecutor(max_workers=FULL_TIER_WORKERS)
+metadata_lock = threading.Lock()
+
+# Near-duplicate detection (MinHash + LSH, index persisted next to metadata).
+# With NEAR_DUP_REUSE_ENRICHMENT a cheap scan runs first and, on a match,
+# the closest document's enrichment is copied instead of recomputed.
+NEAR_DUP_THRESHOLD = float(os.environ.get("NEAR_DUP_THRESHOLD", 0.8))
+NEAR_DUP_REUSE_ENRICHMENT = os.environ.get("NEAR_DUP_REUSE_ENRICHMENT", "0") == "1"
+lsh_index = LSHIndex(os.path.join(METADATA_DIR, "minhash_lsh.json"), threshold=NEAR_DUP_THRESHOLD)
 
 # -----------------------------
 # Utility functions
@@ -58,14 +118,11 @@ def infer_tags(path: str):
     }
 
 def file_hash(path: str) -> str:
+    h = hashlib.md5()
     with open(path, "rb") as f:
-        return hashlib.md5(f.read()).hexdigest()
-
-def detect_language(text: str) -> str:
-    try:
-        return detect(text)
-    except Exception:
-        return "unknown"
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
 
 def generate_quick_overview(text: str, max_chars: int = 500) -> str:
     return text.strip().replace("\n", " ")[:max_chars]
@@ -113,13 +170,6 @@ def build_sitemap(root_folder: str) -> List[dict]:
 # -----------------------------
 # PDF metadata extractor
 # -----------------------------
-def extract_pdf_text(file_path: str) -> str:
-    text_chunks = []
-    with fitz.open(file_path) as doc:
-        for page in doc:
-            text_chunks.append(page.get_text("text"))
-    return "\n".join(text_chunks)
-
 def extract_pdf_metadata(file_path: str) -> dict:
     props = {}
     try:
@@ -139,22 +189,60 @@ def extract_pdf_metadata(file_path: str) -> dict:
 
     return props
 
-async def process_pdf(entry: dict, root_folder: str, preview_chars: int = 1500) -> dict:
+async def process_pdf(entry: dict, root_folder: str, preview_chars: int = 1500,
+                      tier: str = "full") -> dict:
     full_path = os.path.join(root_folder, entry["relative_path"])
     start = time.time()
     try:
-        text = await asyncio.to_thread(extract_pdf_text, full_path)
         props = await asyncio.to_thread(extract_pdf_metadata, full_path)
-        lang = detect_language(text)
-        hash_val = file_hash(full_path)
-        enrichment = await metadata_extractors.enrich_text(text, props.get("page_count", 0))
+        hash_val = await asyncio.to_thread(file_hash, full_path)
+        doc_id = hash_val[:12]
+        near_dup, reused = None, None
+        if tier == "fast":
+            streamed = await pdf_stream.fast_enrich_pdf(
+                full_path, props.get("page_count", 0),
+                preview_chars=preview_chars,
+                time_budget_sec=FAST_TIER_BUDGET_SEC,
+                seed=hash_val,
+                in_process_pool=OFFLOAD_CPU_WORK,
+                max_workers=EXTRACTION_WORKERS
+            )
+            if streamed["complete"]:
+                # The sample was the whole document: nothing left to upgrade
+                tier = "full"
+                near_dup = find_near_duplicate(streamed["minhash"], doc_id)
+        else:
+            if NEAR_DUP_REUSE_ENRICHMENT:
+                scan = await pdf_stream.run_cpu(pdf_stream.scan_pdf, full_path, preview_chars,
+                                                in_process_pool=OFFLOAD_CPU_WORK,
+                                                max_workers=EXTRACTION_WORKERS)
+                near_dup = find_near_duplicate(scan["minhash"], doc_id)
+                reused = load_metadata_doc(near_dup["id"]) if near_dup else None
+            if reused:
+                streamed = reuse_enrichment(scan, reused, props.get("page_count", 0))
+            else:
+                streamed = await pdf_stream.stream_enrich_pdf(
+                    full_path, props.get("page_count", 0),
+                    preview_chars=preview_chars,
+                    max_doc_chars=MAX_DOC_MEMORY_CHARS,
+                    parallel_threshold=PARALLEL_PAGE_THRESHOLD,
+                    pages_per_range=PAGES_PER_RANGE,
+                    max_workers=EXTRACTION_WORKERS
+                )
+                near_dup = near_dup or find_near_duplicate(streamed["minhash"], doc_id)
+        if streamed["minhash"]:
+            lsh_index.add(doc_id, entry["filename"], streamed["minhash"])
+        lang = await pdf_stream.run_cpu(pdf_stream.detect_language, streamed["language_sample"],
+                                        in_process_pool=OFFLOAD_CPU_WORK,
+                                        max_workers=EXTRACTION_WORKERS)
+        enrichment = streamed["enrichment"]
     except Exception as e:
         return {"error": str(e), "filename": entry.get("filename", "unknown")}
 
     elapsed = round(time.time() - start, 3)
 
     return {
-        "id": hash_val[:12],
+        "id": doc_id,
         "filename": entry["filename"],
         "relative_path": entry["relative_path"],
         "extension": entry["extension"],
@@ -166,24 +254,228 @@ async def process_pdf(entry: dict, root_folder: str, preview_chars: int = 1500)
         "file_size_bytes": props.get("file_size_bytes"),
         "last_modified": props.get("modified_time"),
         "page_count": props.get("page_count"),
-        "content_length": len(text),
+        "content_length": streamed["content_length"],
         "pdf_metadata": props.get("pdf_metadata"),
         "hash": hash_val,
         "language": lang,
         "ingested_at": datetime.now(timezone.utc).isoformat(),
-        "content_preview": text[:preview_chars],
+        "content_preview": streamed["content_preview"],
         "overview_summary": enrichment["content_summary"]["summary"],
         "content_summary": enrichment["content_summary"],
         "classification": enrichment["classification"],
         "industry_tags": enrichment["industry_tags"],
         "entities": enrichment["entities"],
+        "enrichment_tier": tier,
+        "near_duplicate_of": near_dup,
+        "enrichment_reused_from": reused["id"] if reused else None,
         "extraction_time_sec": elapsed
     }
 
-async def process_all_pdfs(sitemap: List[dict], root_folder: str):
-    tasks = [process_pdf(entry, root_folder) for entry in sitemap]
+def find_near_duplicate(signature, doc_id: str):
+    if not signature:
+        return None
+    return lsh_index.query(signature, exclude_id=doc_id)
+
+def prune_lsh_index(previous_ids: set, results: List[dict]):
+    """Drop corpus documents that left (or changed content) since the last ingest."""
+    current = {d["id"] for d in results if "id" in d}
+    for doc_id in previous_ids - current:
+        if not os.path.exists(os.path.join(METADATA_DIR, f"user_{doc_id}.json")):
+            lsh_index.remove(doc_id)
+
+def corpus_ids(path: str) -> set:
+    if not os.path.exists(path):
+        return set()
+    return {record.get("id") for _, record in metadata_store.iter_records(path)}
+
+def load_metadata_doc(doc_id: str):
+    """Stored full-tier metadata for a document, from user uploads or the corpus file."""
+    def is_full(d):
+        return d.get("id") == doc_id and d.get("enrichment_tier", "full") == "full"
+
+    user_path = os.path.join(METADATA_DIR, f"user_{doc_id}.json")
+    try:
+        if os.path.exists(user_path):
+            with open(user_path, "r", encoding="utf-8") as f:
+                d = json.load(f)
+            if is_full(d):
+                return d
+        return metadata_store.find_record(METADATA_PATH, is_full)
+    except Exception:
+        return None
+
+def reuse_enrichment(scan: dict, source: dict, page_count: int) -> dict:
+    enrichment = metadata_extractors.build_enrichment(
+        summary_head=scan["summary_head"],
+        word_count=scan["word_count"],
+        page_count=page_count,
+        industries=source.get("industry_tags", {}).get("industries", []),
+        domains=source.get("industry_tags", {}).get("domains", []),
+        entities=source.get("entities", {})
+    )
+    enrichment["classification"] = source.get("classification", enrichment["classification"])
+    return {
+        "enrichment": enrichment,
+        "content_length": scan["content_length"],
+        "content_preview": scan["content_preview"],
+        "language_sample": scan["language_sample"],
+        "minhash": scan["minhash"],
+    }
+
+async def process_all_pdfs(sitemap: List[dict], root_folder: str, tier: str = "full"):
+    tasks = [process_pdf(entry, root_folder, tier=tier) for entry in sitemap]
     return await asyncio.gather(*tasks)
 
+# -----------------------------
+# Background full-tier upgrade
+# -----------------------------
+def save_metadata_doc(meta_path: str, doc: dict):
+    """Replace `doc` (by relative path) in the corpus JSON Lines file, or overwrite a single-doc file."""
+    if meta_path.endswith(".jsonl"):
+        metadata_store.replace_record(meta_path, doc)
+        return
+    with metadata_lock:
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=2, ensure_ascii=False)
+
+def save_metadata_docs(meta_path: str, docs: List[dict]):
+    """Like save_metadata_doc for several docs, with a single rewrite of a JSON Lines file."""
+    if meta_path.endswith(".jsonl"):
+        metadata_store.replace_records(meta_path, docs)
+        return
+    for doc in docs:
+        save_metadata_doc(meta_path, doc)
+
+def upgrade_to_full_tier(entries: List[dict], root_folder: str, meta_path: str):
+    # Graph and similarity are updated per document; metadata once per batch
+    upgraded = []
+    for entry in entries:
+        result = asyncio.run(process_pdf(entry, root_folder, tier="full"))
+        if "error" in result:
+            print(f"Full-tier enrichment failed for {result['filename']}: {result['error']}")
+            continue
+        handler.create_document_graph(result)
+        similarity.add_document(result)
+        upgraded.append(result)
+    if upgraded:
+        save_metadata_docs(meta_path, upgraded)
+        lsh_index.maybe_save()
+
+def schedule_full_tier(entries: List[dict], root_folder: str, meta_path: str):
+    for i in range(0, len(entries), FULL_TIER_SAVE_BATCH):
+        full_tier_executor.submit(upgrade_to_full_tier, entries[i:i + FULL_TIER_SAVE_BATCH],
+                                  root_folder, meta_path)
+
+# -----------------------------
+# Shared request helpers (also used by asgi.py)
+# -----------------------------
+def rfp_entry(filename: str) -> dict:
+    return {
+        "filename": filename,
+        "relative_path": filename,
+        "extension": ".pdf",
+        "domain": "User",
+        "region": "Unknown",
+        "client": "Unknown"
+    }
+
+def refresh_current_doc(current_doc):
+    """Swap in the background full-tier result for a fast-tier upload once it has landed."""
+    if not current_doc or current_doc.get("enrichment_tier") != "fast":
+        return current_doc
+    user_meta_path = os.path.join(METADATA_DIR, f"user_{current_doc['id']}.json")
+    try:
+        with open(user_meta_path, "r", encoding="utf-8") as f:
+            stored = json.load(f)
+        if stored.get("enrichment_tier") == "full":
+            return stored
+    except Exception:
+        pass
+    return current_doc
+
+def describe_current_doc(current_doc: dict) -> str:
+    context = f"User uploaded doc: {current_doc['filename']} (id {current_doc['id']})\n"
+    context += f"Summary: {current_doc.get('overview_summary','')}\n"
+    industries = current_doc.get("industry_tags", {}).get("industries", [])
+    if industries:
+        context += f"Industries: {', '.join(industries)}\n"
+    entities = current_doc.get("entities", {})
+    if entities:
+        context += "Entities:\n"
+        for k,v in entities.items():
+            if v:
+                context += f"  {k}: {', '.join(v)}\n"
+    return context
+
+def format_related(related) -> str:
+    lines = [f"{fn} (similarity {score:.2f})" for fn, score in related]
+    return "Related docs:\n" + "\n".join(lines) + "\n" if lines else ""
+
+def corpus_sample_context() -> str:
+    if not os.path.exists(METADATA_PATH):
+        return ""
+    try:
+        # Take top 3 summaries for grounding
+        docs = [d for _, d in islice(metadata_store.iter_records(METADATA_PATH), 3)]
+        snippets = []
+        for d in docs:
+            snippets.append(f"{d['filename']}: {d.get('overview_summary','')}")
+        return "Sample corpus summaries:\n" + "\n".join(snippets) + "\n"
+    except Exception as e:
+        return f"(Metadata load failed: {e})\n"
+
+def build_chat_prompt(context: str, history: List[dict], user_msg: str) -> str:
+    # Prompt with history
+    hist_str = "\n".join([f"{t['role']}: {t['content']}" for t in history[-10:]])
+    return (
+        f"SYSTEM: You are a helpful assistant. Ground answers in the provided context and cite filenames when relevant.\n"
+        f"CONTEXT:\n{context}\n\n"
+        f"HISTORY:\n{hist_str}\n\n"
+        f"USER: {user_msg}\nASSISTANT:"
+    )
+
+GRAPH_VIEW_QUERY = """
+    MATCH (a)-[r]->(b)
+    RETURN a, r, b LIMIT 200
+"""
+
+NODE_COLORS = {
+    "Document": "#1f77b4",   # blue
+    "Client": "#2ca02c",     # green
+    "Region": "#ff7f0e",     # orange
+    "Domain": "#9467bd",     # purple
+    "Industry": "#8c564b",   # brown
+    "Technology": "#17becf", # teal
+    "Partner": "#d62728",    # red
+    "Product": "#bcbd22",    # yellow-green
+    "Organization": "#e377c2" # pink
+}
+
+def graph_elements(records):
+    nodes, edges = [], []
+    seen = set()
+
+    for record in records:
+        a, r, b = record["a"], record["r"], record["b"]
+
+        for n in (a, b):
+            if n.id not in seen:
+                label = list(n.labels)[0] if n.labels else "Node"
+                nodes.append({
+                    "id": n.id,
+                    "label": label,
+                    "title": dict(n),
+                    "color": NODE_COLORS.get(label, "#7f7f7f")  # default grey
+                })
+                seen.add(n.id)
+
+        edges.append({
+            "from": a.id,
+            "to": b.id,
+            "label": r.type
+        })
+    return nodes, edges
+
 # -----------------------------
 # Auth (basic placeholder)
 # -----------------------------
@@ -224,20 +516,32 @@ def user_panel():
 # -----------------------------
 @app.route("/ingest", methods=["GET"])
 def ingest():
-    sitemap = build_sitemap(UPLOADS_DIR)
-    sitemap_path = os.path.join(SITEMAP_DIR, "sitemap.json")
-    with open(sitemap_path, "w", encoding="utf-8") as f:
-        json.dump(sitemap, f, indent=2, ensure_ascii=False)
-
-    results = asyncio.run(process_all_pdfs(sitemap, UPLOADS_DIR))
-    metadata_path = os.path.join(METADATA_DIR, "metadata.json")
-    with open(metadata_path, "w", encoding="utf-8") as f:
-        json.dump(results, f, indent=2, ensure_ascii=False)
+    tier = request.args.get("tier", INGEST_TIER)
+    if tier not in ENRICHMENT_TIERS:
+        return jsonify({"error": f"Unknown tier '{tier}'"}), 400
 
-    # Push to Neo4j
-    for doc in results:
-        if "id" in doc and "filename" in doc and "error" not in doc:
-            handler.create_document_graph(doc)
+    sitemap = build_sitemap(UPLOADS_DIR)
+    sitemap_path = SITEMAP_PATH
+    metadata_store.write_records(sitemap_path, sitemap)
+
+    results = asyncio.run(process_all_pdfs(sitemap, UPLOADS_DIR, tier=tier))
+    metadata_path = METADATA_PATH
+    prune_lsh_index(corpus_ids(metadata_path), results)
+    metadata_store.write_records(metadata_path, results)
+
+    # Push to Neo4j. Documents ran concurrently, so a near-duplicate can point
+    # at a copy later in this list; link them once every node is written.
+    written = [doc for doc in results if "id" in doc and "filename" in doc and "error" not in doc]
+    for doc in written:
+        handler.create_document_graph(doc, link_near_duplicate=False)
+        similarity.add_document(doc)
+    handler.link_near_duplicates(written)
+    lsh_index.save()
+
+    # Documents the fast sample covered completely are already full tier
+    fast_names = {d["filename"] for d in results if d.get("enrichment_tier") == "fast"}
+    if fast_names:
+        schedule_full_tier([e for e in sitemap if e["filename"] in fast_names], UPLOADS_DIR, metadata_path)
 
     preview = json.dumps(results[:1], indent=2, ensure_ascii=False)
     return render_template(
@@ -248,76 +552,50 @@ def ingest():
         metadata_preview=preview
     )
 
+@app.route("/rebuild_similarity", methods=["POST", "GET"])
+def rebuild_similarity():
+    """Offline job: recompute SIMILAR_TO edges for the whole corpus."""
+    start = time.time()
+    count = similarity.rebuild()
+    return jsonify({"status": "ok", "documents": count, "elapsed_sec": round(time.time() - start, 3)})
+
+# -----------------------------
+# Paged record views
+# -----------------------------
+# Filters per view; paging, cursors and ETags are metadata_store.page_records
+METADATA_FILTERS = {
+    "industry": lambda d: d.get("industry_tags", {}).get("industries", []),
+    "document_type": lambda d: [d.get("classification", {}).get("document_type")],
+    "language": lambda d: [d.get("language")],
+    "enrichment_tier": lambda d: [d.get("enrichment_tier", "full")],
+}
+SITEMAP_FILTERS = {
+    "domain": lambda d: [d.get("domain")],
+    "region": lambda d: [d.get("region")],
+    "client": lambda d: [d.get("client")],
+}
+
+def paged_records_response(path: str, filter_getters: dict, missing_message: str):
+    status, headers, body = metadata_store.page_records(
+        path, filter_getters, missing_message,
+        request.args, request.query_string.decode(),
+        request.if_none_match.contains, request.headers.get("Accept-Encoding", "")
+    )
+    if isinstance(body, dict):
+        return jsonify(body), status
+    return Response(body, status=status, mimetype="application/json", headers=headers)
+
 @app.route("/view_sitemap", methods=["GET"])
 def view_sitemap():
-    path = os.path.join(SITEMAP_DIR, "sitemap.json")
-    if not os.path.exists(path):
-        return jsonify({"error": "No sitemap found. Run ingestion first."}), 404
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    return jsonify(data)
+    return paged_records_response(SITEMAP_PATH, SITEMAP_FILTERS, "No sitemap found. Run ingestion first.")
 
 @app.route("/view_metadata", methods=["GET"])
 def view_metadata():
-    path = os.path.join(METADATA_DIR, "metadata.json")
-    if not os.path.exists(path):
-        return jsonify({"error": "No metadata found. Run ingestion first."}), 404
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    return jsonify(data)
+    return paged_records_response(METADATA_PATH, METADATA_FILTERS, "No metadata found. Run ingestion first.")
 
 @app.route("/view_graph", methods=["GET"])
 def view_graph():
-    with driver.session() as session_db:
-        result = session_db.run("""
-            MATCH (a)-[r]->(b)
-            RETURN a, r, b LIMIT 200
-        """)
-        nodes, edges = [], []
-        seen = set()
-
-        def node_color(label):
-            colors = {
-                "Document": "#1f77b4",   # blue
-                "Client": "#2ca02c",     # green
-                "Region": "#ff7f0e",     # orange
-                "Domain": "#9467bd",     # purple
-                "Industry": "#8c564b",   # brown
-                "Technology": "#17becf", # teal
-                "Partner": "#d62728",    # red
-                "Product": "#bcbd22"     # yellow-green
-            }
-            return colors.get(label, "#7f7f7f")  # default grey
-
-        for record in result:
-            a, r, b = record["a"], record["r"], record["b"]
-
-            if a.id not in seen:
-                label_a = list(a.labels)[0] if a.labels else "Node"
-                nodes.append({
-                    "id": a.id,
-                    "label": label_a,
-                    "title": dict(a),
-                    "color": node_color(label_a)
-                })
-                seen.add(a.id)
-
-            if b.id not in seen:
-                label_b = list(b.labels)[0] if b.labels else "Node"
-                nodes.append({
-                    "id": b.id,
-                    "label": label_b,
-                    "title": dict(b),
-                    "color": node_color(label_b)
-                })
-                seen.add(b.id)
-
-            edges.append({
-                "from": a.id,
-                "to": b.id,
-                "label": r.type
-            })
-
+    nodes, edges = graph_elements(db.run_read(GRAPH_VIEW_QUERY))
     return render_template(
         "graph.html",
         nodes=json.dumps(nodes),
@@ -371,33 +649,37 @@ def upload_rfp():
     file.save(dest_path)
 
     # Build a sitemap-like entry for this single file
-    entry = {
-        "filename": filename,
-        "relative_path": filename,
-        "extension": ".pdf",
-        "domain": "User",
-        "region": "Unknown",
-        "client": "Unknown"
-    }
+    entry = rfp_entry(filename)
 
-    # Process PDF (extract text, metadata, enrichment)
-    result = asyncio.run(process_pdf(entry, USER_RFP_DIR))
+    # Process PDF (extract text, metadata, enrichment); fast tier first so
+    # the user can chat right away, full tier follows in the background
+    result = asyncio.run(process_pdf(entry, USER_RFP_DIR, tier=UPLOAD_TIER))
+    if "error" in result:
+        return jsonify({"status": "error", "message": result["error"]}), 500
 
     # Save metadata JSON for this user doc (optional)
     user_meta_path = os.path.join(METADATA_DIR, f"user_{result['id']}.json")
-    with open(user_meta_path, "w", encoding="utf-8") as f:
-        json.dump(result, f, indent=2, ensure_ascii=False)
+    save_metadata_doc(user_meta_path, result)
+    lsh_index.maybe_save()
 
     # Push into Neo4j graph
     handler.create_document_graph(result)
+    similarity.add_document(result)
+    if result["enrichment_tier"] == "fast":
+        schedule_full_tier([entry], USER_RFP_DIR, user_meta_path)
 
     # Track enriched doc in session
     session["current_doc"] = result
     session["chat_history"] = []  # reset chat history for new upload
 
-    return jsonify({"status": "success", "saved_to": dest_path, "doc_id": result["id"]})
-@app.route("/chatbot", methods=["POST"])
+    return jsonify({
+        "status": "success",
+        "saved_to": dest_path,
+        "doc_id": result["id"],
+        "enrichment_tier": result["enrichment_tier"]
+    })
 
+@app.route("/chatbot", methods=["POST"])
 def chatbot():
     data = request.get_json(force=True)
     user_msg = (data.get("message") or "").strip()
@@ -410,59 +692,21 @@ def chatbot():
 
     # Build context
     context = ""
-    current_doc = session.get("current_doc")
+    current_doc = refresh_current_doc(session.get("current_doc"))
     if current_doc:
-        context += f"User uploaded doc: {current_doc['filename']} (id {current_doc['id']})\n"
-        context += f"Summary: {current_doc.get('overview_summary','')}\n"
-        industries = current_doc.get("industry_tags", {}).get("industries", [])
-        if industries:
-            context += f"Industries: {', '.join(industries)}\n"
-        entities = current_doc.get("entities", {})
-        if entities:
-            context += "Entities:\n"
-            for k,v in entities.items():
-                if v:
-                    context += f"  {k}: {', '.join(v)}\n"
-
-    # Pull related docs from Neo4j
+        session["current_doc"] = current_doc
+        context += describe_current_doc(current_doc)
 
         # Pull related docs from Neo4j
         try:
-            with driver.session() as sess:
-                res = sess.run("""
-                    MATCH (d:Document {id:$doc_id})-[]->(x)<-[]-(other:Document)
-                    WHERE other.id <> $doc_id
-                    RETURN other.filename AS filename, labels(x)[0] AS via
-                    LIMIT 10
-                """, doc_id=current_doc["id"])
-                related = [f"{r['filename']} via {r['via']}" for r in res]
-            if related:
-                context += "Related docs:\n" + "\n".join(related) + "\n"
+            context += format_related(neo4j_related(db, current_doc["id"], top_k=10))
         except Exception as e:
             context += f"(Neo4j lookup failed: {e})\n"
 
     # Add metadata summaries
-    meta_path = os.path.join(METADATA_DIR, "metadata.json")
-    if os.path.exists(meta_path):
-        try:
-            docs = json.load(open(meta_path, encoding="utf-8"))
-            # Take top 3 summaries for grounding
-            snippets = []
-            for d in docs[:3]:
-                snippets.append(f"{d['filename']}: {d.get('overview_summary','')}")
-            context += "Sample corpus summaries:\n" + "\n".join(snippets) + "\n"
-        except Exception as e:
-            context += f"(Metadata load failed: {e})\n"
-
-    # Prompt with history
-    hist_str = "\n".join([f"{t['role']}: {t['content']}" for t in history[-10:]])
-    prompt = (
-        f"SYSTEM: You are a helpful assistant. Ground answers in the provided context and cite filenames when relevant.\n"
-        f"CONTEXT:\n{context}\n\n"
-        f"HISTORY:\n{hist_str}\n\n"
-        f"USER: {user_msg}\nASSISTANT:"
-    )
+    context += corpus_sample_context()
 
+    prompt = build_chat_prompt(context, history, user_msg)
     answer = ask_llama(prompt)
     history.append({"role": "assistant", "content": answer})
     session["chat_history"] = history
@@ -474,12 +718,13 @@ def logout():
     session.clear()
     return redirect(url_for("home"))
 
-@app.teardown_appcontext
-def close_driver(exception):
-    try:
-        driver.close()
-    except:
-        pass
+@app.route("/neo4j_stats", methods=["GET"])
+def neo4j_stats():
+    return jsonify(db.pool_stats())
+
+@app.route("/llm_stats", methods=["GET"])
+def llm_stats():
+    return jsonify(llm_scheduler.stats())
 
 # -----------------------------
 # Static file serving convenience (optional)
@@ -0,0 +1,286 @@
+"""
+ASGI serving mode: the routes and templates of app.py served by Quart, with
+handlers that await Neo4j (async driver), the LLM (shared scheduler) and
+document extraction (thread/process executors) instead of blocking a worker.
+
+    pip install quart uvicorn
+    uvicorn asgi:app --port 5000
+
+(httpx, used for LLM calls, is a core dependency of both apps.)
+
+Pipeline code, config and the shared request helpers come from app.py.
+Handlers patch SIMILAR_TO edges through the async driver; background jobs
+(full-tier upgrades, similarity rebuilds) keep running on app.py's thread
+executor with the sync driver. File reads go through asyncio.to_thread.
+"""
+import os
+
+# Keep CPU-bound extraction out of the server process, where it would hold
+# the GIL and stall every coroutine: full-tier page ranges, the fast-tier
+# sample, language detection and near-duplicate scans all go to the
+# process pool (set before app.py reads its config). Only the merge of
+# worker results and the graph/similarity bookkeeping run here.
+os.environ.setdefault("PARALLEL_PAGE_THRESHOLD", "0")
+os.environ.setdefault("OFFLOAD_CPU_WORK", "1")
+
+import asyncio
+import json
+import time
+from itertools import islice
+
+from quart import (
+    Quart, Response, jsonify, render_template, request,
+    redirect, url_for, session
+)
+from werkzeug.utils import secure_filename
+
+import app as core
+from modules import metadata_store
+from modules.neo4j_driver import AsyncNeo4jDriverManager
+from modules.neo4j_handler import AsyncNeo4jHandler
+from modules.ollama_helper import ask_llama_async, llm_scheduler
+from modules.retrieval import neo4j_related_async
+
+app = Quart(__name__)
+app.secret_key = core.app.secret_key
+
+async_db = AsyncNeo4jDriverManager(
+    core.NEO4J_URI, core.NEO4J_USER, core.NEO4J_PASSWORD,
+    max_pool_size=core.NEO4J_MAX_POOL_SIZE,
+    acquisition_timeout=core.NEO4J_ACQUISITION_TIMEOUT,
+    max_connection_lifetime=core.NEO4J_MAX_CONNECTION_LIFETIME
+)
+async_handler = AsyncNeo4jHandler(async_db)
+
+@app.after_serving
+async def shutdown():
+    await async_db.close()
+
+# Response chunks pulled per thread hop when streaming a paged view
+STREAM_CHUNKS_PER_READ = 64
+
+async def iterate_in_thread(chunks):
+    """Drive a blocking (file-reading) iterator from worker threads, a batch at a time."""
+    while True:
+        batch = await asyncio.to_thread(lambda: list(islice(chunks, STREAM_CHUNKS_PER_READ)))
+        for chunk in batch:
+            yield chunk
+        if len(batch) < STREAM_CHUNKS_PER_READ:
+            return
+
+async def paged_records_response(path: str, filter_getters: dict, missing_message: str):
+    status, headers, body = await asyncio.to_thread(
+        metadata_store.page_records,
+        path, filter_getters, missing_message,
+        request.args, request.query_string.decode(),
+        request.if_none_match.contains, request.headers.get("Accept-Encoding", "")
+    )
+    if isinstance(body, dict):
+        return jsonify(body), status
+    return Response(iterate_in_thread(body), status=status, mimetype="application/json", headers=headers)
+
+async def store_document(doc: dict, meta_path: str = None, link_near_duplicate: bool = True):
+    if meta_path:
+        await asyncio.to_thread(core.save_metadata_doc, meta_path, doc)
+    await async_handler.create_document_graph(doc, link_near_duplicate)
+    await core.similarity.add_document_async(doc, async_db)
+
+# -----------------------------
+# Auth (basic placeholder)
+# -----------------------------
+@app.route("/login", methods=["GET", "POST"])
+async def login():
+    if request.method == "GET":
+        return await render_template("login.html")
+    form = await request.form
+    username = form.get("username", "")
+    if username.lower().startswith("admin"):
+        session["role"] = "admin"
+        return redirect(url_for("admin_panel"))
+    else:
+        session["role"] = "user"
+        return redirect(url_for("user_panel"))
+
+# -----------------------------
+# Dashboard and panels
+# -----------------------------
+@app.route("/")
+async def home():
+    return await render_template("dashboard.html")
+
+@app.route("/admin", methods=["GET"])
+async def admin_panel():
+    return await render_template("admin.html")
+
+@app.route("/user", methods=["GET"])
+async def user_panel():
+    return await render_template("user.html")
+
+# -----------------------------
+# Admin actions
+# -----------------------------
+@app.route("/ingest", methods=["GET"])
+async def ingest():
+    tier = request.args.get("tier", core.INGEST_TIER)
+    if tier not in core.ENRICHMENT_TIERS:
+        return jsonify({"error": f"Unknown tier '{tier}'"}), 400
+
+    sitemap = await asyncio.to_thread(core.build_sitemap, core.UPLOADS_DIR)
+    await asyncio.to_thread(metadata_store.write_records, core.SITEMAP_PATH, sitemap)
+
+    results = await core.process_all_pdfs(sitemap, core.UPLOADS_DIR, tier=tier)
+    previous_ids = await asyncio.to_thread(core.corpus_ids, core.METADATA_PATH)
+    core.prune_lsh_index(previous_ids, results)
+    await asyncio.to_thread(metadata_store.write_records, core.METADATA_PATH, results)
+
+    # Push to Neo4j; near-duplicate edges once every node exists (see app.ingest)
+    written = [doc for doc in results if "id" in doc and "filename" in doc and "error" not in doc]
+    for doc in written:
+        await store_document(doc, link_near_duplicate=False)
+    await async_handler.link_near_duplicates(written)
+    await asyncio.to_thread(core.lsh_index.save)
+
+    fast_names = {d["filename"] for d in results if d.get("enrichment_tier") == "fast"}
+    if fast_names:
+        core.schedule_full_tier([e for e in sitemap if e["filename"] in fast_names],
+                                core.UPLOADS_DIR, core.METADATA_PATH)
+
+    preview = json.dumps(results[:1], indent=2, ensure_ascii=False)
+    return await render_template(
+        "results.html",
+        files_processed=len(results),
+        sitemap_file=core.SITEMAP_PATH,
+        metadata_file=core.METADATA_PATH,
+        metadata_preview=preview
+    )
+
+@app.route("/rebuild_similarity", methods=["POST", "GET"])
+async def rebuild_similarity():
+    start = time.time()
+    count = await asyncio.to_thread(core.similarity.rebuild)
+    return jsonify({"status": "ok", "documents": count, "elapsed_sec": round(time.time() - start, 3)})
+
+@app.route("/view_sitemap", methods=["GET"])
+async def view_sitemap():
+    return await paged_records_response(core.SITEMAP_PATH, core.SITEMAP_FILTERS,
+                                        "No sitemap found. Run ingestion first.")
+
+@app.route("/view_metadata", methods=["GET"])
+async def view_metadata():
+    return await paged_records_response(core.METADATA_PATH, core.METADATA_FILTERS,
+                                        "No metadata found. Run ingestion first.")
+
+@app.route("/view_graph", methods=["GET"])
+async def view_graph():
+    nodes, edges = core.graph_elements(await async_db.run_read(core.GRAPH_VIEW_QUERY))
+    return await render_template(
+        "graph.html",
+        nodes=json.dumps(nodes),
+        edges=json.dumps(edges)
+    )
+
+@app.route("/upload_folder", methods=["POST"])
+async def upload_folder():
+    files = (await request.files).getlist("folder")
+    if not files:
+        return jsonify({"status": "no_files"}), 400
+
+    saved = []
+    for f in files:
+        if not f.filename.lower().endswith(".pdf"):
+            continue  # skip non-PDFs
+        filename = secure_filename(f.filename)
+        dest_path = os.path.join(core.UPLOADS_DIR, filename)
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        await f.save(dest_path)
+        saved.append(dest_path)
+
+    if not saved:
+        return jsonify({"status": "no_pdfs"}), 400
+
+    return jsonify({"status": "success", "files_saved": saved})
+
+# -----------------------------
+# User actions
+# -----------------------------
+@app.route("/upload_rfp", methods=["POST"])
+async def upload_rfp():
+    file = (await request.files).get("rfp_file")
+    if file is None or file.filename == "":
+        return jsonify({"status": "no_file"}), 400
+
+    filename = secure_filename(file.filename)
+    if not filename.lower().endswith(".pdf"):
+        return jsonify({"status": "invalid_type", "message": "Only PDF allowed"}), 400
+
+    dest_path = os.path.join(core.USER_RFP_DIR, filename)
+    await file.save(dest_path)
+
+    entry = core.rfp_entry(filename)
+    result = await core.process_pdf(entry, core.USER_RFP_DIR, tier=core.UPLOAD_TIER)
+    if "error" in result:
+        return jsonify({"status": "error", "message": result["error"]}), 500
+
+    user_meta_path = os.path.join(core.METADATA_DIR, f"user_{result['id']}.json")
+    await store_document(result, user_meta_path)
+    await asyncio.to_thread(core.lsh_index.maybe_save)
+    if result["enrichment_tier"] == "fast":
+        core.schedule_full_tier([entry], core.USER_RFP_DIR, user_meta_path)
+
+    session["current_doc"] = result
+    session["chat_history"] = []  # reset chat history for new upload
+
+    return jsonify({
+        "status": "success",
+        "saved_to": dest_path,
+        "doc_id": result["id"],
+        "enrichment_tier": result["enrichment_tier"]
+    })
+
+@app.route("/chatbot", methods=["POST"])
+async def chatbot():
+    data = await request.get_json(force=True)
+    user_msg = (data.get("message") or "").strip()
+    if not user_msg or len(user_msg) > 1000:
+        return jsonify({"status": "error", "message": "Invalid input"}), 400
+
+    history = session.setdefault("chat_history", [])
+    history.append({"role": "user", "content": user_msg})
+
+    context = ""
+    current_doc = await asyncio.to_thread(core.refresh_current_doc, session.get("current_doc"))
+    if current_doc:
+        session["current_doc"] = current_doc
+        context += core.describe_current_doc(current_doc)
+        try:
+            context += core.format_related(await neo4j_related_async(async_db, current_doc["id"], top_k=10))
+        except Exception as e:
+            context += f"(Neo4j lookup failed: {e})\n"
+
+    context += await asyncio.to_thread(core.corpus_sample_context)
+
+    prompt = core.build_chat_prompt(context, history, user_msg)
+    answer = await ask_llama_async(prompt)
+    history.append({"role": "assistant", "content": answer})
+    session["chat_history"] = history
+
+    return jsonify({"status": "ok", "answer": answer, "history": history})
+
+@app.route("/logout")
+async def logout():
+    session.clear()
+    return redirect(url_for("home"))
+
+@app.route("/neo4j_stats", methods=["GET"])
+async def neo4j_stats():
+    return jsonify({"async": async_db.pool_stats(), "sync": core.db.pool_stats()})
+
+@app.route("/llm_stats", methods=["GET"])
+async def llm_stats():
+    return jsonify(llm_scheduler.stats())
+
+# -----------------------------
+# Run app
+# -----------------------------
+if __name__ == "__main__":
+    app.run(port=5000)
@@ -0,0 +1,163 @@
+"""
+Local stand-in for the NVIDIA NIM chat completions endpoint, for load tests.
+
+    python loadtest/fake_llm.py --port 8089 --latency-ms 800 --rate-limit-ratio 0.05
+
+Point the app at it with NIM_API_BASE=http://127.0.0.1:8089/v1. Replies are
+canned text after a configurable delay; a share of requests can be answered
+with 429, and bodies can be delivered in slow chunks to mimic a model
+generating tokens (the app does not request SSE streaming).
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+@dataclass
+class FakeLLMConfig:
+    latency_ms: float = 800.0
+    jitter_ms: float = 400.0
+    rate_limit_ratio: float = 0.0
+    stream_chunks: int = 0          # >0: send the body in this many chunks
+    chunk_delay_ms: float = 50.0
+    reply_words: int = 120
+
+class FakeLLMStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.rate_limited = 0
+        self.completed = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def started(self):
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def finished(self, rate_limited: bool):
+        with self._lock:
+            self.in_flight -= 1
+            if rate_limited:
+                self.rate_limited += 1
+            else:
+                self.completed += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "rate_limited": self.rate_limited,
+                "completed": self.completed,
+                "peak_in_flight": self.peak_in_flight,
+            }
+
+_WORDS = ("the proposal covers data platform migration governance analytics delivery "
+          "timeline risk mitigation cloud architecture team staffing pricing assumptions").split()
+
+def _reply_text(prompt: str, words: int) -> str:
+    rng = random.Random(len(prompt))
+    return " ".join(rng.choice(_WORDS) for _ in range(words)) + "."
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config: FakeLLMConfig = FakeLLMConfig()
+    stats: FakeLLMStats = FakeLLMStats()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": "not found"})
+            return
+
+        self.stats.started()
+        rate_limited = random.random() < self.config.rate_limit_ratio
+        try:
+            if rate_limited:
+                self._send_json(429, {"error": "rate limited"}, {"Retry-After": "1"})
+                return
+            delay = self.config.latency_ms + random.uniform(-1, 1) * self.config.jitter_ms
+            time.sleep(max(delay, 0) / 1000)
+
+            prompt = (body.get("messages") or [{}])[-1].get("content", "")
+            text = _reply_text(prompt, self.config.reply_words)
+            self._send_json(200, {
+                "id": "fake-completion",
+                "object": "chat.completion",
+                "model": body.get("model", ""),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": text}}],
+                "usage": {"prompt_tokens": len(prompt.split()), "completion_tokens": len(text.split())},
+            })
+        finally:
+            self.stats.finished(rate_limited)
+
+    # -----------------------------
+    # Writers
+    # -----------------------------
+    def _send_json(self, status: int, payload: dict, headers: dict = None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        chunks = self.config.stream_chunks if status == 200 else 0
+        if chunks > 0:
+            # Same JSON body, trickled out like tokens off a streaming model
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            size = max(1, -(-len(data) // chunks))
+            for i in range(0, len(data), size):
+                self._write_chunk(data[i:i + size])
+                time.sleep(self.config.chunk_delay_ms / 1000)
+            self._write_chunk(b"")
+        else:
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+def start_fake_llm(host: str = "127.0.0.1", port: int = 8089, config: FakeLLMConfig = None):
+    """Serve on a daemon thread; returns (server, stats). Call server.shutdown() to stop."""
+    stats = FakeLLMStats()
+    handler = type("ConfiguredFakeLLMHandler", (FakeLLMHandler,),
+                   {"config": config or FakeLLMConfig(), "stats": stats})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-llm", daemon=True).start()
+    return server, stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=800)
+    parser.add_argument("--jitter-ms", type=float, default=400)
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0)
+    parser.add_argument("--stream-chunks", type=int, default=0)
+    parser.add_argument("--chunk-delay-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    server, stats = start_fake_llm(args.host, args.port, FakeLLMConfig(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, rate_limit_ratio=args.rate_limit_ratio,
+        stream_chunks=args.stream_chunks, chunk_delay_ms=args.chunk_delay_ms
+    ))
+    print(f"Fake LLM on http://{args.host}:{args.port}/v1 (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(10)
+            print(stats.snapshot())
+    except KeyboardInterrupt:
+        server.shutdown()
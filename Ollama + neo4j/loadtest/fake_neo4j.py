@@ -0,0 +1,82 @@
+"""
+In-memory stand-in for the neo4j driver, for load tests without a database.
+
+Every query is accepted, costs a configurable delay and returns no records,
+so the app's Neo4j paths (writes at ingest, related-document lookups) run
+end to end but graph-derived context is empty. Use a local Neo4j instead
+when query cost itself is under test.
+"""
+import threading
+import time
+from collections import Counter
+
+class FakeResult:
+    def __iter__(self):
+        return iter(())
+
+    def consume(self):
+        return None
+
+    def data(self):
+        return []
+
+class FakeTransaction:
+    def __init__(self, driver: "FakeDriver"):
+        self.driver = driver
+
+    def run(self, query: str, parameters: dict = None, **kwargs) -> FakeResult:
+        self.driver.record(query)
+        return FakeResult()
+
+class FakeSession:
+    def __init__(self, driver: "FakeDriver"):
+        self.driver = driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def execute_read(self, work, *args, **kwargs):
+        return work(FakeTransaction(self.driver), *args, **kwargs)
+
+    def execute_write(self, work, *args, **kwargs):
+        return work(FakeTransaction(self.driver), *args, **kwargs)
+
+    def run(self, query: str, parameters: dict = None, **kwargs) -> FakeResult:
+        return FakeTransaction(self.driver).run(query, parameters, **kwargs)
+
+    def close(self):
+        pass
+
+class FakeDriver:
+    def __init__(self, latency_ms: float = 2.0):
+        self.latency_ms = latency_ms
+        self.queries = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, query: str):
+        keyword = (query.split() or ["?"])[0].upper()
+        with self._lock:
+            self.queries[keyword] += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+    def session(self, **kwargs) -> FakeSession:
+        return FakeSession(self)
+
+    def verify_connectivity(self):
+        pass
+
+    def close(self):
+        pass
+
+class FakeGraphDatabase:
+    """Drop-in for `neo4j.GraphDatabase`: `driver(uri, **kwargs)` returns a shared FakeDriver."""
+
+    def __init__(self, latency_ms: float = 2.0):
+        self.instance = FakeDriver(latency_ms)
+
+    def driver(self, uri: str, **kwargs) -> FakeDriver:
+        return self.instance
@@ -0,0 +1,376 @@
+"""
+End-to-end load test: starts the Flask app against a local fake LLM and a
+fake (or local) Neo4j, replays concurrent user sessions and reports
+throughput, latency percentiles per endpoint, error rates and server memory.
+Runs fully offline on one Linux box; all data goes to a scratch directory.
+
+    python loadtest/run.py --users 20 --turns 5
+    python loadtest/run.py --users 50 --llm-latency-ms 1500 --llm-429-ratio 0.1 --llm-stream-chunks 20
+    python loadtest/run.py --neo4j local --neo4j-uri neo4j://localhost:7687 --neo4j-password secret --out report.json
+
+Each virtual user logs in, uploads an RFP from --pdf-dir (POST /upload_rfp)
+and holds a multi-turn /chatbot conversation. Once --ingest-at of the users
+have started (at the latest with the last user), an admin runs /ingest over
+--ingest-files PDFs in parallel. --neo4j local connects with NEO4J_URI,
+NEO4J_USER and NEO4J_PASSWORD unless the matching flags are given.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import requests
+
+from fake_llm import FakeLLMConfig, start_fake_llm
+
+LOADTEST_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(LOADTEST_DIR)
+
+CHAT_MESSAGES = [
+    "Summarise the scope of this RFP.",
+    "Which industries and technologies does it mention?",
+    "What similar past proposals do we have?",
+    "What are the main delivery risks?",
+    "Draft three win themes for our response.",
+    "Which partners should we involve?",
+    "What assumptions should we state on pricing?",
+]
+
+# Answers the app returns instead of an error status when the LLM fails
+LLM_FALLBACKS = ("AI response unavailable.", "AI response timed out.",
+                 "AI is busy, please retry shortly.", "Failed to get data.")
+
+# -----------------------------
+# Measurements
+# -----------------------------
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples: List[Dict] = []
+        self.started_at = time.time()
+
+    def record(self, endpoint: str, latency: float, ok: bool, status, fallback: bool = False):
+        with self._lock:
+            self.samples.append({
+                "endpoint": endpoint,
+                "at": time.time() - self.started_at,
+                "latency": latency,
+                "ok": ok,
+                "status": status,
+                "fallback": fallback,
+            })
+
+    def call(self, endpoint: str, fn, *args, **kwargs):
+        start = time.time()
+        try:
+            resp = fn(*args, **kwargs)
+        except requests.RequestException as e:
+            self.record(endpoint, time.time() - start, False, type(e).__name__)
+            return None
+        fallback = False
+        if endpoint == "/chatbot" and resp.ok:
+            try:
+                fallback = resp.json().get("answer", "") in LLM_FALLBACKS
+            except ValueError:
+                pass
+        self.record(endpoint, time.time() - start, resp.ok, resp.status_code, fallback)
+        return resp
+
+def _process_tree(pid: int) -> List[int]:
+    children = defaultdict(list)
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+                children[ppid].append(int(entry))
+            except (OSError, ValueError, IndexError):
+                pass
+    tree, stack = [], [pid]
+    while stack:
+        p = stack.pop()
+        tree.append(p)
+        stack.extend(children.get(p, ()))
+    return tree
+
+def _rss_mb(pid: int) -> float:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+class MemorySampler(threading.Thread):
+    """RSS of the server and its worker processes (extraction pool) over time."""
+
+    def __init__(self, pid: int, interval: float, started_at: float):
+        super().__init__(name="memory-sampler", daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.started_at = started_at
+        self.samples: List[Dict] = []
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.is_set():
+            tree = _process_tree(self.pid)
+            self.samples.append({
+                "at": round(time.time() - self.started_at, 2),
+                "server_mb": round(_rss_mb(self.pid), 1),
+                "total_mb": round(sum(_rss_mb(p) for p in tree), 1),
+                "processes": len(tree),
+            })
+            self._done.wait(self.interval)
+
+    def stop(self):
+        self._done.set()
+
+# -----------------------------
+# Scenarios
+# -----------------------------
+def user_session(base: str, rec: Recorder, user_id: int, pdf_path: str, turns: int,
+                 think: float, timeout: float):
+    http = requests.Session()
+    rec.call("/login", http.post, f"{base}/login", data={"username": f"user{user_id}"}, timeout=timeout)
+
+    with open(pdf_path, "rb") as f:
+        data = f.read()
+    # Unique name per user so concurrent uploads do not overwrite each other
+    name = f"lt_{user_id}_{os.path.basename(pdf_path)}"
+    resp = rec.call("/upload_rfp", http.post, f"{base}/upload_rfp",
+                    files={"rfp_file": (name, data, "application/pdf")}, timeout=timeout)
+    if resp is None or not resp.ok:
+        return
+
+    for turn in range(turns):
+        time.sleep(random.uniform(0, think))
+        message = CHAT_MESSAGES[(user_id + turn) % len(CHAT_MESSAGES)]
+        rec.call("/chatbot", http.post, f"{base}/chatbot", json={"message": message}, timeout=timeout)
+
+def admin_ingest(base: str, rec: Recorder, timeout: float):
+    http = requests.Session()
+    rec.call("/login", http.post, f"{base}/login", data={"username": "admin"}, timeout=timeout)
+    rec.call("/ingest", http.get, f"{base}/ingest", timeout=timeout)
+
+# -----------------------------
+# Report
+# -----------------------------
+def _percentile(ordered: List[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered))) - 1))]
+
+def build_report(rec: Recorder, duration: float, memory: List[Dict], extra: Dict) -> Dict:
+    by_endpoint = defaultdict(list)
+    for s in rec.samples:
+        by_endpoint[s["endpoint"]].append(s)
+
+    endpoints = {}
+    for endpoint, samples in sorted(by_endpoint.items()):
+        lat = sorted(s["latency"] * 1000 for s in samples)
+        errors = [s for s in samples if not s["ok"]]
+        statuses = defaultdict(int)
+        for s in errors:
+            statuses[str(s["status"])] += 1
+        endpoints[endpoint] = {
+            "requests": len(samples),
+            "throughput_rps": round(len(samples) / duration, 3) if duration else 0.0,
+            "errors": len(errors),
+            "error_rate": round(len(errors) / len(samples), 4),
+            "error_statuses": dict(statuses),
+            "llm_fallbacks": sum(1 for s in samples if s["fallback"]),
+            "p50_ms": round(_percentile(lat, 0.50), 1),
+            "p90_ms": round(_percentile(lat, 0.90), 1),
+            "p95_ms": round(_percentile(lat, 0.95), 1),
+            "p99_ms": round(_percentile(lat, 0.99), 1),
+            "max_ms": round(lat[-1], 1),
+        }
+
+    total = len(rec.samples)
+    total_errors = sum(1 for s in rec.samples if not s["ok"])
+    return {
+        "duration_sec": round(duration, 2),
+        "requests": total,
+        "throughput_rps": round(total / duration, 3) if duration else 0.0,
+        "error_rate": round(total_errors / total, 4) if total else 0.0,
+        "endpoints": endpoints,
+        "memory": {
+            "start_mb": memory[0]["total_mb"] if memory else None,
+            "peak_mb": max((m["total_mb"] for m in memory), default=None),
+            "end_mb": memory[-1]["total_mb"] if memory else None,
+            "timeline": memory,
+        },
+        **extra,
+    }
+
+def print_report(report: Dict):
+    print(f"\nDuration {report['duration_sec']}s, {report['requests']} requests, "
+          f"{report['throughput_rps']} req/s, error rate {report['error_rate']:.2%}\n")
+    header = f"{'endpoint':<14}{'reqs':>6}{'rps':>8}{'err%':>7}{'fallbk':>7}{'p50':>9}{'p90':>9}{'p95':>9}{'p99':>9}{'max':>9}"
+    print(header)
+    print("-" * len(header))
+    for endpoint, e in report["endpoints"].items():
+        print(f"{endpoint:<14}{e['requests']:>6}{e['throughput_rps']:>8}{e['error_rate']:>7.1%}"
+              f"{e['llm_fallbacks']:>7}{e['p50_ms']:>9}{e['p90_ms']:>9}{e['p95_ms']:>9}"
+              f"{e['p99_ms']:>9}{e['max_ms']:>9}")
+        if e["error_statuses"]:
+            print(f"{'':<14}errors: {e['error_statuses']}")
+
+    mem = report["memory"]
+    print(f"\nServer memory (RSS incl. workers): start {mem['start_mb']} MB, "
+          f"peak {mem['peak_mb']} MB, end {mem['end_mb']} MB")
+    timeline = mem["timeline"]
+    step = max(1, len(timeline) // 10)
+    for m in timeline[::step]:
+        print(f"  t={m['at']:>7}s  {m['total_mb']:>8} MB  ({m['processes']} processes)")
+
+    for key in ("fake_llm", "llm_scheduler", "neo4j"):
+        if report.get(key):
+            print(f"\n{key}: {json.dumps(report[key])}")
+
+# -----------------------------
+# Main
+# -----------------------------
+def wait_until_up(base: str, proc: subprocess.Popen, timeout: float):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Server exited with code {proc.returncode}")
+        try:
+            if requests.get(f"{base}/", timeout=2).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Server not up after {timeout}s")
+
+def _get_json(url: str) -> Dict:
+    try:
+        return requests.get(url, timeout=10).json()
+    except (requests.RequestException, ValueError):
+        return {}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=5, help="chat turns per user")
+    parser.add_argument("--ramp-sec", type=float, default=10, help="spread user starts over this long")
+    parser.add_argument("--think-sec", type=float, default=2, help="max pause between chat turns")
+    parser.add_argument("--pdf-dir", default=os.path.join(APP_DIR, "KM_folder"))
+    parser.add_argument("--ingest-files", type=int, default=5, help="PDFs copied in for the mid-run /ingest (0 to skip)")
+    parser.add_argument("--ingest-at", type=float, default=0.5, help="start /ingest after this share of users")
+    parser.add_argument("--port", type=int, default=5050)
+    parser.add_argument("--llm-port", type=int, default=8089)
+    parser.add_argument("--llm-latency-ms", type=float, default=800)
+    parser.add_argument("--llm-jitter-ms", type=float, default=400)
+    parser.add_argument("--llm-429-ratio", type=float, default=0.0)
+    parser.add_argument("--llm-stream-chunks", type=int, default=0)
+    parser.add_argument("--llm-chunk-delay-ms", type=float, default=50)
+    parser.add_argument("--neo4j", choices=["fake", "local"], default="fake")
+    parser.add_argument("--neo4j-uri", default=os.environ.get("NEO4J_URI", "neo4j://localhost:7687"))
+    parser.add_argument("--neo4j-user", default=os.environ.get("NEO4J_USER", "neo4j"))
+    parser.add_argument("--neo4j-password", default=os.environ.get("NEO4J_PASSWORD", "graph@123"))
+    parser.add_argument("--neo4j-latency-ms", type=float, default=2)
+    parser.add_argument("--request-timeout", type=float, default=300)
+    parser.add_argument("--sample-sec", type=float, default=1.0, help="memory sampling interval")
+    parser.add_argument("--out", help="write the full report (with memory timeline) as JSON")
+    parser.add_argument("--keep-data", action="store_true", help="keep the scratch data dir")
+    args = parser.parse_args()
+
+    pdfs = sorted(os.path.join(args.pdf_dir, f) for f in os.listdir(args.pdf_dir) if f.lower().endswith(".pdf"))
+    if not pdfs:
+        sys.exit(f"No PDFs in {args.pdf_dir}")
+
+    data_dir = tempfile.mkdtemp(prefix="loadtest_")
+    os.makedirs(os.path.join(data_dir, "uploads"))
+    for path in pdfs[:args.ingest_files]:
+        shutil.copy(path, os.path.join(data_dir, "uploads"))
+
+    llm_server, llm_stats = start_fake_llm("127.0.0.1", args.llm_port, FakeLLMConfig(
+        latency_ms=args.llm_latency_ms, jitter_ms=args.llm_jitter_ms,
+        rate_limit_ratio=args.llm_429_ratio, stream_chunks=args.llm_stream_chunks,
+        chunk_delay_ms=args.llm_chunk_delay_ms
+    ))
+
+    env = dict(os.environ,
+               APP_DATA_DIR=data_dir,
+               NIM_API_BASE=f"http://127.0.0.1:{args.llm_port}/v1",
+               NVIDIA_API_KEY="loadtest",
+               NEO4J_URI=args.neo4j_uri,
+               NEO4J_USER=args.neo4j_user,
+               NEO4J_PASSWORD=args.neo4j_password)
+    cmd = [sys.executable, os.path.join(LOADTEST_DIR, "serve.py"), "--port", str(args.port)]
+    if args.neo4j == "fake":
+        cmd += ["--fake-neo4j", "--neo4j-latency-ms", str(args.neo4j_latency_ms)]
+    log_path = os.path.join(data_dir, "server.log")
+    log = open(log_path, "w")
+    server = subprocess.Popen(cmd, cwd=APP_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base = f"http://127.0.0.1:{args.port}"
+
+    try:
+        print(f"Starting server (data dir {data_dir}, log {log_path})...")
+        wait_until_up(base, server, timeout=180)
+
+        rec = Recorder()
+        sampler = MemorySampler(server.pid, args.sample_sec, rec.started_at)
+        sampler.start()
+
+        print(f"Running {args.users} users x {args.turns} chat turns...")
+        # Clamped so --ingest-at 1.0 starts it alongside the last user instead of never
+        ingest_after = min(int(args.users * args.ingest_at), args.users - 1)
+        ingest_thread = None
+        with ThreadPoolExecutor(max_workers=args.users) as pool:
+            for i in range(args.users):
+                if i == ingest_after and args.ingest_files:
+                    ingest_thread = threading.Thread(target=admin_ingest, args=(base, rec, args.request_timeout))
+                    ingest_thread.start()
+                pool.submit(user_session, base, rec, i, pdfs[i % len(pdfs)], args.turns,
+                            args.think_sec, args.request_timeout)
+                time.sleep(args.ramp_sec / max(args.users, 1))
+        if ingest_thread:
+            ingest_thread.join()
+        duration = time.time() - rec.started_at
+        sampler.stop()
+        sampler.join()
+
+        report = build_report(rec, duration, sampler.samples, {
+            "config": {k: v for k, v in vars(args).items() if k != "neo4j_password"},
+            "fake_llm": llm_stats.snapshot(),
+            "llm_scheduler": _get_json(f"{base}/llm_stats"),
+            "neo4j": _get_json(f"{base}/loadtest/fake_neo4j_stats") or _get_json(f"{base}/neo4j_stats"),
+        })
+        print_report(report)
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            print(f"\nReport written to {args.out}")
+    except Exception:
+        log.flush()
+        with open(log_path, "r", errors="replace") as f:
+            print("".join(f.readlines()[-40:]), file=sys.stderr)
+        raise
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+        log.close()
+        llm_server.shutdown()
+        if not args.keep_data:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Run app.py under a threaded Werkzeug server for load tests (started by
+run.py; configure data dir, LLM and Neo4j through the environment).
+
+    python loadtest/serve.py --port 5050 [--fake-neo4j --neo4j-latency-ms 2]
+"""
+import argparse
+import os
+import sys
+
+LOADTEST_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(LOADTEST_DIR))
+sys.path.insert(0, LOADTEST_DIR)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5050)
+    parser.add_argument("--fake-neo4j", action="store_true")
+    parser.add_argument("--neo4j-latency-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    fake_db = None
+    if args.fake_neo4j:
+        # Patched before app.py builds its manager; the driver is created lazily
+        from fake_neo4j import FakeGraphDatabase
+        from modules import neo4j_driver
+        fake_db = FakeGraphDatabase(args.neo4j_latency_ms)
+        neo4j_driver.GraphDatabase = fake_db
+
+    import app as core
+    from flask import jsonify
+
+    @core.app.route("/loadtest/fake_neo4j_stats")
+    def fake_neo4j_stats():
+        return jsonify(dict(fake_db.instance.queries) if fake_db else {})
+
+    core.app.run(host=args.host, port=args.port, threaded=True, debug=False, use_reloader=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+import json
+import os
+import re
+import unicodedata
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Entity buckets written to metadata, in tie-break order. Every bucket
+# becomes graph nodes; "organizations" holds ORGs with no role cue, and
+# clients named in the text join the sitemap's client tag.
+ENTITY_ROLES = ["partners", "clients", "products", "technologies", "organizations"]
+IGNORE_ROLE = "ignore"
+
+# Canonical name -> role and aliases. `prefix` entries also match longer
+# spans that start with an alias ("Capgemini America, Inc.", "Capgemini
+# Project Team"). Entries without a role only merge spellings; the role
+# still comes from sentence cues. Extend or override with a JSON file of the
+# same shape at ENTITY_GAZETTEER_PATH, where {"role": "ignore"} drops a name
+# (e.g. the authoring firm or boilerplate tagged as ORG) from every document.
+DEFAULT_GAZETTEER = {
+    "Capgemini": {"aliases": ["capgemini group", "capgemini america"], "prefix": True},
+    # Technologies
+    "Azure": {"role": "technologies", "aliases": ["microsoft azure"]},
+    "AWS": {"role": "technologies", "aliases": ["amazon web services"]},
+    "Google Cloud": {"role": "technologies", "aliases": ["gcp", "google cloud platform"]},
+    "Kubernetes": {"role": "technologies", "aliases": ["k8s"]},
+    "Terraform": {"role": "technologies"},
+    "Snowflake": {"role": "technologies"},
+    "Databricks": {"role": "technologies"},
+    "Informatica": {"role": "technologies", "aliases": ["iics", "informatica cloud"]},
+    # Partners
+    "Microsoft": {"role": "partners", "aliases": ["microsoft corporation"]},
+    "SAP": {"role": "partners"},
+    "Salesforce": {"role": "partners"},
+    "IBM": {"role": "partners"},
+}
+
+GAZETTEER_PATH = os.environ.get("ENTITY_GAZETTEER_PATH", "")
+
+MAX_ENTITY_WORDS = 5
+MAX_ENTITY_CHARS = 60
+
+_APOSTROPHES = str.maketrans({"’": "'", "‘": "'", "`": "'", "´": "'"})
+_EDGE_PUNCT = " \t•·-–—*:;,.()[]{}\"'|/\\"
+_POSSESSIVE = re.compile(r"'s$|(?<=s)'$", re.IGNORECASE)
+_LEGAL_SUFFIX = re.compile(
+    r",?\s+(inc|ltd|llc|plc|corp|corporation|co|gmbh|ag|sa|limited|incorporated)\.?$", re.IGNORECASE
+)
+_LEADING_THE = re.compile(r"^the\s+", re.IGNORECASE)
+_TRIE_END = ""
+
+# -----------------------------
+# Surface normalisation
+# -----------------------------
+def clean_surface(text: str) -> str:
+    """Collapse whitespace, curly quotes, possessives, legal suffixes and a leading "the"."""
+    text = unicodedata.normalize("NFKC", text).translate(_APOSTROPHES)
+    text = " ".join(text.split()).strip(_EDGE_PUNCT)
+    text = _POSSESSIVE.sub("", text)
+    text = _LEGAL_SUFFIX.sub("", text)
+    text = _LEADING_THE.sub("", text)
+    return text.strip(_EDGE_PUNCT)
+
+def entity_tokens(text: str) -> List[str]:
+    """Case-folded tokens used as trie and dedupe keys."""
+    return [_POSSESSIVE.sub("", t) for t in clean_surface(text).casefold().split()]
+
+def entity_key(text: str) -> str:
+    return " ".join(entity_tokens(text))
+
+def _display(cleaned: str) -> str:
+    # Shouted or all-lowercase spans get one stable spelling; short acronyms
+    # ("SAP", "AI") and mixed case ("McKinsey") are kept as written.
+    if cleaned.isupper() or cleaned.islower():
+        return " ".join(w.capitalize() if len(w) > 3 else w for w in cleaned.split())
+    return cleaned
+
+def _is_entity(cleaned: str) -> bool:
+    return (
+        2 <= len(cleaned) <= MAX_ENTITY_CHARS
+        and len(cleaned.split()) <= MAX_ENTITY_WORDS
+        and any(c.isalpha() for c in cleaned)
+    )
+
+# -----------------------------
+# Gazetteer
+# -----------------------------
+class Gazetteer:
+    """Canonical entities and their aliases, matched token by token through a trie."""
+
+    def __init__(self, entries: Dict[str, Dict]):
+        self.roles: Dict[str, str] = {}
+        self._trie: Dict = {}
+        for canonical, spec in entries.items():
+            if spec.get("role"):
+                self.roles[entity_key(canonical)] = spec["role"]
+            value = (canonical, spec.get("role"), spec.get("prefix", False))
+            for alias in [canonical, *spec.get("aliases", [])]:
+                node = self._trie
+                for token in entity_tokens(alias):
+                    node = node.setdefault(token, {})
+                node[_TRIE_END] = value
+
+    def _longest_match(self, tokens: List[str], start: int = 0) -> Optional[Tuple[int, Tuple]]:
+        node, match = self._trie, None
+        for i in range(start, len(tokens)):
+            node = node.get(tokens[i])
+            if node is None:
+                break
+            if _TRIE_END in node:
+                match = (i + 1, node[_TRIE_END])
+        return match
+
+    def lookup(self, text: str) -> Optional[Tuple[str, Optional[str]]]:
+        """(canonical, role) if the whole span is a known alias (or starts with a prefix alias)."""
+        tokens = entity_tokens(text)
+        match = self._longest_match(tokens)
+        if match and (match[0] == len(tokens) or match[1][2]):
+            return match[1][0], match[1][1]
+        return None
+
+    def scan(self, tokens: List[str]) -> Iterator[Tuple[str, Optional[str]]]:
+        """(canonical, role) for every non-overlapping alias in a lower-cased token stream."""
+        i = 0
+        while i < len(tokens):
+            match = self._longest_match(tokens, i)
+            if match:
+                yield match[1][0], match[1][1]
+                i = match[0]
+            else:
+                i += 1
+
+def load_gazetteer(path: str = GAZETTEER_PATH) -> Gazetteer:
+    entries = dict(DEFAULT_GAZETTEER)
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            entries.update(json.load(f))
+    return Gazetteer(entries)
+
+# Loaded once per process (including extraction workers)
+gazetteer = load_gazetteer()
+
+# -----------------------------
+# Role votes
+# -----------------------------
+def canonicalize(text: str) -> Optional[Tuple[str, Optional[str]]]:
+    """(canonical name, gazetteer role or None), or None for spans that are not entities."""
+    hit = gazetteer.lookup(text)
+    if hit:
+        return hit
+    cleaned = clean_surface(text)
+    if not _is_entity(cleaned):
+        return None
+    return _display(cleaned), None
+
+def add_vote(votes: Dict[str, Dict], text: str, role: str, count: int = 1, max_entities: int = None):
+    """Record one mention of `text` in `role`, keyed by its canonical form."""
+    canonical = canonicalize(text)
+    if canonical is None:
+        return
+    key = entity_key(canonical[0])
+    entry = votes.get(key)
+    if entry is None:
+        if max_entities is not None and len(votes) >= max_entities:
+            return
+        entry = votes[key] = {"name": canonical[0], "roles": {}}
+    entry["roles"][role] = entry["roles"].get(role, 0) + count
+
+def merge_votes(votes: Dict[str, Dict], other: Dict[str, Dict], max_entities: int = None):
+    for key, entry in other.items():
+        if key not in votes:
+            if max_entities is not None and len(votes) >= max_entities:
+                continue
+            votes[key] = {"name": entry["name"], "roles": {}}
+        roles = votes[key]["roles"]
+        for role, count in entry["roles"].items():
+            roles[role] = roles.get(role, 0) + count
+
+def _resolve_role(key: str, roles: Dict[str, int]) -> str:
+    fixed = gazetteer.roles.get(key)
+    if fixed:
+        return fixed
+    cued = {r: c for r, c in roles.items() if r != "organizations"}
+    if cued:
+        best = max(cued.values())
+        winners = [r for r in ENTITY_ROLES if cued.get(r) == best]
+        # A tie (e.g. a record listing the same name under every role) is no evidence
+        if len(winners) == 1:
+            return winners[0]
+    return "organizations"
+
+def resolve_roles(votes: Dict[str, Dict], max_per_role: int = None) -> Dict[str, List[str]]:
+    """One role per entity: gazetteer role, else the single most-voted cued role, else organizations."""
+    buckets = {role: [] for role in ENTITY_ROLES}
+    ranked = sorted(votes.items(), key=lambda kv: (-sum(kv[1]["roles"].values()), kv[0]))
+    for key, entry in ranked:
+        role = _resolve_role(key, entry["roles"])
+        if role == IGNORE_ROLE or role not in buckets:
+            continue
+        if max_per_role is None or len(buckets[role]) < max_per_role:
+            buckets[role].append(entry["name"])
+    return buckets
+
+def canonical_entities(entities: Dict[str, Iterable[str]]) -> Dict[str, List[str]]:
+    """Normalise and dedupe a stored `entities` dict (including legacy records that list every ORG under each role)."""
+    votes: Dict[str, Dict] = {}
+    for role, names in (entities or {}).items():
+        for name in set(names or ()):
+            add_vote(votes, name, role)
+    return resolve_roles(votes)
@@ -1,15 +1,13 @@
 import os, json
 from collections import defaultdict
 from flask import render_template
-from neo4j import GraphDatabase
 from modules.ollama_helper import ask_llama
 
-def render_classification_tables(docs, driver):
+def render_classification_tables(docs, db):
     rel_lines = []
-    with driver.session() as sess:
-        result = sess.run("MATCH ()-[r]->() RETURN type(r) AS rel_name, count(r) AS cnt")
-        for rec in result:
-            rel_lines.append(f"{rec['rel_name']}: {rec['cnt']}")
+    result = db.run_read("MATCH ()-[r]->() RETURN type(r) AS rel_name, count(r) AS cnt")
+    for rec in result:
+        rel_lines.append(f"{rec['rel_name']}: {rec['cnt']}")
     rel_summary = "Graph Relations:\n" + "\n".join(rel_lines) if rel_lines else "Graph Relations: (none found)"
 
     group_counts, sector_counts, service_counts = defaultdict(int), defaultdict(int), defaultdict(int)
@@ -37,4 +35,4 @@ def summarize_with_llama(docs):
     prompt = "Summarize the following documents by group priority, sector, and service offering:\n\n"
     for d in docs:
         prompt += f"- {d['filename']}: {d.get('overview_summary','')[:100]}...\n"
-    return ask_llama(prompt)
\ No newline at end of file
+    return ask_llama(prompt, priority="batch")
\ No newline at end of file
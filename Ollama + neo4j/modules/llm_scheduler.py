@@ -0,0 +1,207 @@
+import asyncio
+import concurrent.futures
+import hashlib
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional
+
+PRIORITIES = {"interactive": 0, "batch": 10}
+
+class LLMQueueFull(Exception):
+    pass
+
+class LLMDeadlineExceeded(Exception):
+    pass
+
+class _Job:
+    __slots__ = ("key", "prompt", "model", "priority", "deadline", "future",
+                 "enqueued_at", "started", "waiters")
+
+    def __init__(self, key, prompt, model, priority, deadline, future, enqueued_at):
+        self.key = key
+        self.prompt = prompt
+        self.model = model
+        self.priority = priority
+        self.deadline = deadline
+        self.future = future
+        self.enqueued_at = enqueued_at
+        self.started = False
+        self.waiters = 1
+
+class LLMScheduler:
+    """
+    Single queue in front of the LLM provider, shared by sync (Flask) and
+    async (ASGI) callers.
+
+    - priority classes: "interactive" jobs are always dequeued before "batch"
+    - at most `max_concurrency` calls in flight (match the provider quota)
+    - identical in-flight prompts for the same model share one call
+    - a job whose deadline passes while queued is dropped, not sent
+
+    The scheduler runs its own event loop on a daemon thread; `call` is an
+    async function (prompt, model) -> str executed on that loop.
+    """
+
+    def __init__(self, call: Callable[[str, str], Awaitable[str]],
+                 max_concurrency: int = 4, max_queue: int = 1000):
+        self._call = call
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._start_lock = threading.Lock()
+        self._heap = []
+        self._seq = itertools.count()
+        self._inflight: Dict[tuple, _Job] = {}
+        self._queued = 0
+        self._running = 0
+        self._stats = {
+            "submitted": 0,
+            "coalesced": 0,
+            "completed": 0,
+            "failed": 0,
+            "expired": 0,
+            "rejected": 0,
+        }
+        self._waits = {name: deque(maxlen=1000) for name in PRIORITIES}
+
+    # -----------------------------
+    # Lifecycle
+    # -----------------------------
+    def _ensure_started(self):
+        if self._loop is not None:
+            return
+        with self._start_lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run():
+                asyncio.set_event_loop(loop)
+                self._wakeup = asyncio.Condition()
+                for _ in range(self.max_concurrency):
+                    loop.create_task(self._worker())
+                ready.set()
+                loop.run_forever()
+
+            threading.Thread(target=run, name="llm-scheduler", daemon=True).start()
+            ready.wait()
+            self._loop = loop
+
+    # -----------------------------
+    # Submission
+    # -----------------------------
+    def submit(self, prompt: str, model: str, priority: str = "interactive",
+               timeout: Optional[float] = None) -> concurrent.futures.Future:
+        """
+        Queue a prompt and return a concurrent Future for its answer. With a
+        `timeout`, the future fails with LLMDeadlineExceeded once it elapses
+        and the call is never sent if it is still queued by then.
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}'")
+        self._ensure_started()
+        return asyncio.run_coroutine_threadsafe(
+            self._submit(prompt, model, priority, timeout), self._loop
+        )
+
+    async def _submit(self, prompt: str, model: str, priority: str, timeout: Optional[float]) -> str:
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        deadline = now + timeout if timeout else None
+        key = (model, hashlib.sha256(prompt.encode("utf-8")).hexdigest())
+        self._stats["submitted"] += 1
+
+        job = self._inflight.get(key)
+        if job is not None:
+            self._stats["coalesced"] += 1
+            job.waiters += 1
+            # The shared call lives as long as its most patient caller
+            job.deadline = None if deadline is None or job.deadline is None else max(job.deadline, deadline)
+            if not job.started and PRIORITIES[priority] < job.priority:
+                job.priority = PRIORITIES[priority]
+                await self._push(job)
+        else:
+            if self._queued >= self.max_queue:
+                self._stats["rejected"] += 1
+                raise LLMQueueFull(f"LLM queue is full ({self.max_queue} waiting)")
+            job = _Job(key, prompt, model, PRIORITIES[priority], deadline, loop.create_future(), now)
+            self._inflight[key] = job
+            self._queued += 1
+            await self._push(job)
+
+        try:
+            if deadline is None:
+                return await asyncio.shield(job.future)
+            return await asyncio.wait_for(asyncio.shield(job.future), deadline - loop.time())
+        except asyncio.TimeoutError:
+            raise LLMDeadlineExceeded(f"No LLM answer within {timeout}s")
+        finally:
+            job.waiters -= 1
+
+    async def _push(self, job: _Job):
+        async with self._wakeup:
+            heapq.heappush(self._heap, (job.priority, next(self._seq), job))
+            self._wakeup.notify()
+
+    # -----------------------------
+    # Workers
+    # -----------------------------
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            async with self._wakeup:
+                while not self._heap:
+                    await self._wakeup.wait()
+                _, _, job = heapq.heappop(self._heap)
+            if job.started or job.future.done():
+                continue  # stale entry left behind by a priority promotion
+
+            self._queued -= 1
+            now = loop.time()
+            if (job.deadline is not None and now >= job.deadline) or job.waiters <= 0:
+                self._stats["expired"] += 1
+                self._inflight.pop(job.key, None)
+                job.future.set_exception(LLMDeadlineExceeded("Deadline passed while queued"))
+                job.future.exception()  # mark retrieved; waiters have already gone
+                continue
+
+            job.started = True
+            self._running += 1
+            name = "interactive" if job.priority == PRIORITIES["interactive"] else "batch"
+            self._waits[name].append(now - job.enqueued_at)
+            try:
+                job.future.set_result(await self._call(job.prompt, job.model))
+                self._stats["completed"] += 1
+            except Exception as e:
+                job.future.set_exception(e)
+                self._stats["failed"] += 1
+            finally:
+                self._running -= 1
+                self._inflight.pop(job.key, None)
+
+    # -----------------------------
+    # Stats
+    # -----------------------------
+    def stats(self) -> Dict:
+        stats = dict(self._stats)
+        stats["max_concurrency"] = self.max_concurrency
+        stats["queue_depth"] = self._queued
+        stats["running"] = self._running
+        waits = {}
+        for name, samples in self._waits.items():
+            ordered = sorted(samples)
+            if ordered:
+                waits[name] = {
+                    "samples": len(ordered),
+                    "p50_sec": round(ordered[len(ordered) // 2], 3),
+                    "p95_sec": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+                    "max_sec": round(ordered[-1], 3),
+                }
+        stats["wait_time"] = waits
+        stats["sampled_at"] = time.time()
+        return stats
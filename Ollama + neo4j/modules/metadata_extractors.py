@@ -1,8 +1,11 @@
 import re
 import asyncio
+import time
 from typing import List, Dict
 import spacy
 
+from modules import entity_normalizer
+
 # Load spaCy model once at module level
 nlp = spacy.load("en_core_web_sm")
 
@@ -16,77 +19,252 @@ INDUSTRY_KEYWORDS = {
     "Legal": ["compliance", "contract", "litigation", "regulation", "law", "jurisdiction"]
 }
 
+# Sentence cues that give an ORG span its role; ORGs without one are kept as
+# "organizations". Known names take their role from the gazetteer instead.
+PARTNER_CUES = re.compile(r"\b(partner(s|ship|ships|ed)?|alliances?|resellers?|certified|jointly with|together with)\b")
+CLIENT_CUES = re.compile(r"\b(clients?|customers?)\b|\bon behalf of\b|\bprepared for\b|\bsubmitted to\b")
+
+# Caps on what one document can accumulate while streaming
+MAX_ENTITIES_PER_TYPE = 500
+MAX_ENTITY_CANDIDATES = 5000
+MAX_DOMAIN_CANDIDATES = 5000
+
+# Deadline-bound analysis (fast tier): spaCy throughput assumed until one
+# pass has been timed, and the smallest slice worth a pass at all
+NLP_CHARS_PER_SEC_ESTIMATE = 50_000
+MIN_NLP_CHARS = 2_000
+
+# -----------------------------
+# Sync extractors (shared by the async wrappers and the streaming path)
+# -----------------------------
+def _industries_in(text: str) -> List[str]:
+    text_lower = text.lower()
+    found_keywords = set()
+    for industry, keywords in INDUSTRY_KEYWORDS.items():
+        for keyword in keywords:
+            if re.search(rf"\b{re.escape(keyword.lower())}\b", text_lower):
+                found_keywords.add(industry)
+                break
+    return list(found_keywords)
+
+def _entity_role(ent) -> str:
+    if ent.label_ == "PRODUCT":
+        return "products"
+    sentence = ent.sent.text.lower()
+    if PARTNER_CUES.search(sentence):
+        return "partners"
+    if CLIENT_CUES.search(sentence):
+        return "clients"
+    return "organizations"
+
+def _entity_votes(doc) -> Dict[str, Dict]:
+    """Canonical entity key -> {"name", "roles": {role: mentions}} for one spaCy doc."""
+    votes = {}
+    for ent in doc.ents:
+        if ent.label_ in ["ORG", "PRODUCT"]:
+            entity_normalizer.add_vote(votes, ent.text, _entity_role(ent), max_entities=MAX_ENTITY_CANDIDATES)
+    for canonical, role in entity_normalizer.gazetteer.scan([token.lower_ for token in doc]):
+        entity_normalizer.add_vote(votes, canonical, role or "organizations", max_entities=MAX_ENTITY_CANDIDATES)
+    return votes
+
+def _entities_in(doc) -> Dict[str, List[str]]:
+    return entity_normalizer.resolve_roles(_entity_votes(doc), MAX_ENTITIES_PER_TYPE)
+
+def _domain_tags_in(doc) -> List[str]:
+    return [chunk.text for chunk in doc.noun_chunks if len(chunk.text.split()) <= 3]
+
 # -----------------------------
 # Async wrappers
 # -----------------------------
 async def extract_industry_keywords(text: str) -> List[str]:
-    def _extract():
-        text_lower = text.lower()
-        found_keywords = set()
-        for industry, keywords in INDUSTRY_KEYWORDS.items():
-            for keyword in keywords:
-                if re.search(rf"\b{re.escape(keyword.lower())}\b", text_lower):
-                    found_keywords.add(industry)
-                    break
-        return list(found_keywords)
-    return await asyncio.to_thread(_extract)
+    return await asyncio.to_thread(_industries_in, text)
 
 async def extract_entities(text: str) -> Dict[str, List[str]]:
-    def _extract():
-        doc = nlp(text)
-        entities = {
-            "clients": [],
-            "products": [],
-            "technologies": [],
-            "partners": []
-        }
-        for ent in doc.ents:
-            if ent.label_ in ["ORG", "PRODUCT"]:
-                entities["clients"].append(ent.text)
-                entities["partners"].append(ent.text)
-                entities["products"].append(ent.text)
-        for token in doc:
-            if token.pos_ == "PROPN" and token.text.lower() in ["azure", "terraform", "kubernetes"]:
-                entities["technologies"].append(token.text)
-        # Deduplicate
-        for key in entities:
-            entities[key] = list(set(entities[key]))
-        return entities
-    return await asyncio.to_thread(_extract)
+    return await asyncio.to_thread(lambda: _entities_in(nlp(text)))
 
 async def extract_domain_tags(text: str) -> List[str]:
-    def _extract():
-        doc = nlp(text)
-        return list(set([chunk.text for chunk in doc.noun_chunks if len(chunk.text.split()) <= 3]))
-    return await asyncio.to_thread(_extract)
+    return await asyncio.to_thread(lambda: list(set(_domain_tags_in(nlp(text)))))
 
 # -----------------------------
-# Main async enrichment
+# Incremental enrichment
 # -----------------------------
-async def enrich_text(text: str, page_count: int) -> Dict:
-    industries, domains, entities = await asyncio.gather(
-        extract_industry_keywords(text),
-        extract_domain_tags(text),
-        extract_entities(text)
-    )
-    word_count = len(text.split())
+class EnrichmentAccumulator:
+    """
+    Builds the same enrichment as `enrich_text` from text fed page by page.
+
+    Pages are buffered up to `max_chars` and then run through spaCy once, so
+    memory stays bounded by the buffer size rather than the document size.
+    Accumulators over disjoint page ranges can be combined with `merge`.
+    With `analyse=False` only the text statistics and head are kept. With a
+    `deadline` (time.monotonic()), each spaCy pass only gets as much text as
+    the time left allows, and `truncated` records that text was skipped.
+    """
+
+    def __init__(self, max_chars: int = 200_000, head_chars: int = 1500, analyse: bool = True,
+                 deadline: float = None):
+        self.analyse = analyse
+        self.deadline = deadline
+        self.truncated = False
+        self.max_chars = min(max_chars, nlp.max_length)
+        self.head_chars = max(head_chars, 300)
+        self.head = ""
+        self.pages = 0
+        self.char_count = 0
+        self.word_count = 0
+        self.industries = set()
+        self.entity_votes = {}
+        self.domain_counts = {}
+        self._buffer = []
+        self._buffered = 0
+        self._nlp_chars = 0
+        self._nlp_sec = 0.0
 
+    def add_page(self, page_text: str):
+        if self.pages:
+            self.char_count += 1  # "\n" page separator
+            if len(self.head) < self.head_chars:
+                self.head += "\n"
+        self.pages += 1
+        self.char_count += len(page_text)
+        self.word_count += len(page_text.split())
+        if len(self.head) < self.head_chars:
+            self.head += page_text[:self.head_chars - len(self.head)]
+
+        if not self.analyse:
+            return
+        for piece in _split_to_size(page_text, self.max_chars):
+            if self._buffered + len(piece) > self.max_chars:
+                self.flush()
+            self._buffer.append(piece)
+            self._buffered += len(piece) + 1
+
+    def flush(self):
+        if not self._buffer:
+            return
+        text = "\n".join(self._buffer)
+        self._buffer, self._buffered = [], 0
+        self.industries.update(_industries_in(text))
+        if self.deadline is not None:
+            text = self._fit_to_deadline(text)
+            if not text:
+                return
+        started = time.monotonic()
+        doc = nlp(text)
+        entity_normalizer.merge_votes(self.entity_votes, _entity_votes(doc), MAX_ENTITY_CANDIDATES)
+        for tag in _domain_tags_in(doc):
+            if tag in self.domain_counts or len(self.domain_counts) < MAX_DOMAIN_CANDIDATES:
+                self.domain_counts[tag] = self.domain_counts.get(tag, 0) + 1
+        self._nlp_chars += len(text)
+        self._nlp_sec += time.monotonic() - started
+
+    def _fit_to_deadline(self, text: str) -> str:
+        rate = self._nlp_chars / self._nlp_sec if self._nlp_sec > 0 else NLP_CHARS_PER_SEC_ESTIMATE
+        allowed = int((self.deadline - time.monotonic()) * rate)
+        if allowed >= len(text):
+            return text
+        self.truncated = True
+        if allowed < MIN_NLP_CHARS:
+            return ""
+        cut = text.rfind(" ", 0, allowed)
+        return text[:cut if cut > 0 else allowed]
+
+    def state(self) -> Dict:
+        """Picklable snapshot, used to ship partial results between processes."""
+        self.flush()
+        return {
+            "head": self.head,
+            "pages": self.pages,
+            "char_count": self.char_count,
+            "word_count": self.word_count,
+            "industries": list(self.industries),
+            "entity_votes": self.entity_votes,
+            "domain_counts": self.domain_counts,
+        }
+
+    def merge(self, state: Dict):
+        """Append the state of the page range that follows this one."""
+        self.flush()
+        if state["pages"]:
+            if self.pages:
+                self.char_count += 1
+                if len(self.head) < self.head_chars:
+                    self.head += "\n"
+            if len(self.head) < self.head_chars:
+                self.head += state["head"][:self.head_chars - len(self.head)]
+        self.pages += state["pages"]
+        self.char_count += state["char_count"]
+        self.word_count += state["word_count"]
+        self.industries.update(state["industries"])
+        entity_normalizer.merge_votes(self.entity_votes, state["entity_votes"], MAX_ENTITY_CANDIDATES)
+        for tag, count in state["domain_counts"].items():
+            if tag in self.domain_counts or len(self.domain_counts) < MAX_DOMAIN_CANDIDATES:
+                self.domain_counts[tag] = self.domain_counts.get(tag, 0) + count
+
+    def result(self, page_count: int) -> Dict:
+        self.flush()
+        domains = sorted(self.domain_counts, key=lambda t: -self.domain_counts[t])
+        return build_enrichment(
+            summary_head=self.head[:300],
+            word_count=self.word_count,
+            page_count=page_count,
+            industries=list(self.industries),
+            domains=domains,
+            entities=entity_normalizer.resolve_roles(self.entity_votes, MAX_ENTITIES_PER_TYPE),
+        )
+
+def _split_to_size(text: str, max_chars: int) -> List[str]:
+    if len(text) <= max_chars:
+        return [text]
+    pieces = []
+    while len(text) > max_chars:
+        cut = text.rfind(" ", 0, max_chars)
+        if cut <= 0:
+            cut = max_chars
+        pieces.append(text[:cut])
+        text = text[cut:].lstrip()
+    if text:
+        pieces.append(text)
+    return pieces
+
+def build_enrichment(summary_head: str, word_count: int, page_count: int,
+                      industries: List[str], domains: List[str],
+                      entities: Dict[str, List[str]]) -> Dict:
     return {
         "content_summary": {
-            "summary": text[:300].replace("\n", " ") + "...",  # placeholder
+            "summary": summary_head.replace("\n", " ") + "...",  # placeholder
             "word_count": word_count,
             "page_count": page_count
         },
-"classification": {
-    "document_type": "RFX Response",
-    "sub_type": "Technical Proposal",
-    "group_priority": "Medium",   # placeholder
-    "sector": "General",          # placeholder
-    "service_offerings": ["Consulting"]  # placeholder
-},
+        "classification": {
+            "document_type": "RFX Response",
+            "sub_type": "Technical Proposal",
+            "group_priority": "Medium",   # placeholder
+            "sector": "General",          # placeholder
+            "service_offerings": ["Consulting"]  # placeholder
+        },
         "industry_tags": {
             "industries": industries,
             "domains": domains[:10]  # limit to top 10
         },
         "entities": entities
     }
+
+# -----------------------------
+# Main async enrichment
+# -----------------------------
+async def enrich_text(text: str, page_count: int) -> Dict:
+    industries, domains, entities = await asyncio.gather(
+        extract_industry_keywords(text),
+        extract_domain_tags(text),
+        extract_entities(text)
+    )
+    word_count = len(text.split())
+
+    return build_enrichment(
+        summary_head=text[:300],
+        word_count=word_count,
+        page_count=page_count,
+        industries=industries,
+        domains=domains,
+        entities=entities,
+    )
@@ -0,0 +1,181 @@
+import base64
+import hashlib
+import json
+import os
+import threading
+import zlib
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# Metadata and sitemap records are stored as JSON Lines: one compact record
+# per line, so readers can seek to a byte offset and parse only what they
+# return instead of loading the whole corpus.
+
+_write_lock = threading.Lock()
+
+def _dumps(record: Dict) -> bytes:
+    return (json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n").encode("utf-8")
+
+def write_records(path: str, records: List[Dict]):
+    tmp_path = path + ".tmp"
+    with _write_lock:
+        with open(tmp_path, "wb") as f:
+            for record in records:
+                f.write(_dumps(record))
+        os.replace(tmp_path, path)
+
+def iter_records(path: str, offset: int = 0) -> Iterator[Tuple[int, Dict]]:
+    """Yield (offset_of_next_record, record) starting at byte `offset`."""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for line in iter(f.readline, b""):
+            offset += len(line)
+            if line.strip():
+                yield offset, json.loads(line)
+
+def load_records(path: str) -> List[Dict]:
+    if not os.path.exists(path):
+        return []
+    if path.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return [record for _, record in iter_records(path)]
+
+def find_record(path: str, predicate: Callable[[Dict], bool]) -> Optional[Dict]:
+    if not os.path.exists(path):
+        return None
+    for _, record in iter_records(path):
+        if predicate(record):
+            return record
+    return None
+
+# Records are keyed by file, not by `id`: the id is a content hash, so
+# byte-identical copies under different names share it.
+RECORD_KEY = "relative_path"
+
+def replace_record(path: str, doc: Dict, key: str = RECORD_KEY):
+    """Rewrite the file with `doc` in place of the record sharing its key (appended if new)."""
+    replace_records(path, [doc], key)
+
+def replace_records(path: str, docs: List[Dict], key: str = RECORD_KEY):
+    """Replace several records in one rewrite of the file; new keys are appended."""
+    pending = {doc[key]: doc for doc in docs}
+    replaced = set()
+    tmp_path = path + ".tmp"
+    with _write_lock:
+        with open(tmp_path, "wb") as out:
+            if os.path.exists(path):
+                for _, record in iter_records(path):
+                    k = record.get(key)
+                    if k in replaced:
+                        continue  # an older duplicate of a record already replaced
+                    if k in pending:
+                        record = pending.pop(k)
+                        replaced.add(k)
+                    out.write(_dumps(record))
+            for doc in pending.values():
+                out.write(_dumps(doc))
+        os.replace(tmp_path, path)
+
+def is_record_boundary(path: str, offset: int) -> bool:
+    if offset == 0:
+        return True
+    if offset < 0 or offset > os.path.getsize(path):
+        return False
+    with open(path, "rb") as f:
+        f.seek(offset - 1)
+        return f.read(1) == b"\n"
+
+def file_version(path: str) -> str:
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+def migrate_json(json_path: str, jsonl_path: str):
+    """One-off conversion of a legacy indent=2 JSON list to JSON Lines."""
+    if os.path.exists(json_path) and not os.path.exists(jsonl_path):
+        with open(json_path, "r", encoding="utf-8") as f:
+            write_records(jsonl_path, json.load(f))
+
+# -----------------------------
+# Paged views
+# -----------------------------
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+def encode_cursor(offset: int, version: str) -> str:
+    return base64.urlsafe_b64encode(f"{offset}:{version}".encode()).decode()
+
+def decode_cursor(cursor: str):
+    offset, version = base64.urlsafe_b64decode(cursor.encode()).decode().split(":", 1)
+    return int(offset), version
+
+def page_records(path: str, filter_getters: dict, missing_message: str,
+                 args, query_string: str, etag_matches, accept_encoding: str):
+    """
+    Framework-neutral core of the paged views: returns (status, headers, body)
+    where body is a dict for JSON errors or an iterator of response chunks.
+
+    Query params: limit, cursor (opaque, from the previous page), fields
+    (comma-separated projection) and one param per entry in `filter_getters`
+    (case-insensitive match). Responds 304 when `etag_matches(etag)` and
+    gzips the stream when the client accepts it.
+    """
+    if not os.path.exists(path):
+        return 404, {}, {"error": missing_message}
+
+    # Each encoding is a different representation, so it gets its own ETag
+    encoding = "gzip" if "gzip" in accept_encoding else "identity"
+    version = file_version(path)
+    etag = hashlib.md5(f"{version}?{query_string}".encode()).hexdigest() + f"-{encoding}"
+    headers = {"ETag": f'"{etag}"', "Vary": "Accept-Encoding"}
+    if etag_matches(etag):
+        return 304, headers, iter(())
+
+    try:
+        limit = max(1, min(int(args.get("limit", DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE))
+    except ValueError:
+        return 400, {}, {"error": "limit must be an integer"}
+
+    offset = 0
+    cursor = args.get("cursor")
+    if cursor:
+        try:
+            offset, cursor_version = decode_cursor(cursor)
+        except Exception:
+            return 400, {}, {"error": "Invalid cursor"}
+        if cursor_version != version:
+            return 410, {}, {"error": "Data changed since this cursor was issued; start from the first page."}
+        if not is_record_boundary(path, offset):
+            return 400, {}, {"error": "Invalid cursor"}
+
+    fields = [f for f in args.get("fields", "").split(",") if f]
+    filters = {name: args[name].lower() for name in filter_getters if args.get(name)}
+    size = os.path.getsize(path)
+
+    def generate():
+        yield '{"items":['
+        count, end = 0, offset
+        for end, record in iter_records(path, offset):
+            if any(value not in {str(v).lower() for v in filter_getters[name](record)}
+                   for name, value in filters.items()):
+                continue
+            if fields:
+                record = {f: record[f] for f in fields if f in record}
+            yield ("," if count else "") + json.dumps(record, ensure_ascii=False)
+            count += 1
+            if count == limit:
+                break
+        next_cursor = encode_cursor(end, version) if count == limit and end < size else None
+        yield f'],"count":{count},"next_cursor":{json.dumps(next_cursor)}}}'
+
+    def gzipped(chunks):
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            data = compressor.compress(chunk.encode("utf-8"))
+            if data:
+                yield data
+        yield compressor.flush()
+
+    if encoding == "gzip":
+        headers["Content-Encoding"] = "gzip"
+        return 200, headers, gzipped(generate())
+    return 200, headers, generate()
@@ -0,0 +1,180 @@
+import atexit
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+NUM_PERM = 128
+BANDS = 32               # 32 bands x 4 rows: candidate pairs from roughly 0.4 Jaccard upward
+SHINGLE_WORDS = 5
+SIMILARITY_THRESHOLD = 0.8
+
+# maybe_save() writes the index after this many changes or this long
+SAVE_EVERY = 20
+SAVE_INTERVAL_SEC = 30.0
+
+_EMPTY = (1 << 64) - 1
+_WORD_RE = re.compile(r"\w+")
+
+# -----------------------------
+# MinHash
+# -----------------------------
+class MinHash:
+    """
+    One-permutation MinHash over word shingles.
+
+    Each shingle is hashed once and the hash picks one of `num_perm` bins,
+    keeping the minimum per bin, so updating is O(shingles) and raw bins from
+    disjoint chunks of a document can be combined with `merge`. Empty bins
+    are filled by rotation in `signature()`.
+    """
+
+    def __init__(self, num_perm: int = NUM_PERM, shingle_words: int = SHINGLE_WORDS):
+        self.num_perm = num_perm
+        self.shingle_words = shingle_words
+        self.mins = [_EMPTY] * num_perm
+        self._tail: List[str] = []
+
+    def update(self, text: str):
+        words = self._tail + _WORD_RE.findall(text.lower())
+        n, k, mins = self.shingle_words, self.num_perm, self.mins
+        for i in range(len(words) - n + 1):
+            digest = hashlib.blake2b(" ".join(words[i:i + n]).encode("utf-8"), digest_size=8).digest()
+            h = int.from_bytes(digest, "big")
+            b, v = h % k, h // k
+            if v < mins[b]:
+                mins[b] = v
+        self._tail = words[-(n - 1):] if n > 1 else []
+
+    def merge(self, raw_mins: List[int]):
+        self.mins = [min(a, b) for a, b in zip(self.mins, raw_mins)]
+
+    def signature(self) -> Optional[List[int]]:
+        """Densified signature, or None when the text produced no shingles."""
+        k, mins = self.num_perm, self.mins
+        if all(v == _EMPTY for v in mins):
+            return None
+        offset = (_EMPTY // k) + 1
+        sig = list(mins)
+        for j in range(k):
+            if sig[j] != _EMPTY:
+                continue
+            t = 1
+            while mins[(j + t) % k] == _EMPTY:
+                t += 1
+            sig[j] = mins[(j + t) % k] + t * offset
+        return sig
+
+def estimate_similarity(sig_a: List[int], sig_b: List[int]) -> float:
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / len(sig_a)
+
+# -----------------------------
+# LSH index
+# -----------------------------
+class LSHIndex:
+    """
+    Banded LSH over MinHash signatures, persisted as compact JSON next to
+    the metadata. Only signatures are stored; buckets are rebuilt on load.
+    Callers add documents and call `save()` when a batch is done, or
+    `maybe_save()` after single documents: that writes the file only every
+    `save_every` changes or `save_interval_sec` seconds. Unsaved changes are
+    written at exit.
+    """
+
+    def __init__(self, path: str, num_perm: int = NUM_PERM, bands: int = BANDS,
+                 threshold: float = SIMILARITY_THRESHOLD,
+                 save_every: int = SAVE_EVERY, save_interval_sec: float = SAVE_INTERVAL_SEC):
+        self.path = path
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.save_every = save_every
+        self.save_interval_sec = save_interval_sec
+        self.docs: Dict[str, Dict] = {}
+        self.buckets: Dict[tuple, set] = {}
+        self._lock = threading.Lock()
+        self._dirty = 0
+        self._saved_at = time.monotonic()
+        self.load()
+        atexit.register(self.save)
+
+    def _band_keys(self, sig: List[int]) -> List[tuple]:
+        r = self.rows
+        return [(i,) + tuple(sig[i * r:(i + 1) * r]) for i in range(self.bands)]
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("num_perm") != self.num_perm or data.get("bands") != self.bands:
+            print(f"LSH index at {self.path} uses different parameters; starting fresh")
+            return
+        with self._lock:
+            for doc_id, info in data.get("docs", {}).items():
+                self._add_locked(doc_id, info["filename"], info["signature"])
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {"num_perm": self.num_perm, "bands": self.bands, "docs": self.docs}
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"), ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self._dirty = 0
+            self._saved_at = time.monotonic()
+
+    def maybe_save(self):
+        if self._dirty >= self.save_every or (
+            self._dirty and time.monotonic() - self._saved_at >= self.save_interval_sec
+        ):
+            self.save()
+
+    def add(self, doc_id: str, filename: str, signature: List[int]):
+        with self._lock:
+            self._add_locked(doc_id, filename, signature)
+            self._dirty += 1
+
+    def remove(self, doc_id: str):
+        with self._lock:
+            if self._discard_locked(doc_id):
+                self._dirty += 1
+
+    def _discard_locked(self, doc_id: str) -> bool:
+        old = self.docs.pop(doc_id, None)
+        if not old:
+            return False
+        for key in self._band_keys(old["signature"]):
+            bucket = self.buckets.get(key)
+            if bucket is not None:
+                bucket.discard(doc_id)
+                if not bucket:
+                    del self.buckets[key]
+        return True
+
+    def _add_locked(self, doc_id: str, filename: str, signature: List[int]):
+        self._discard_locked(doc_id)
+        self.docs[doc_id] = {"filename": filename, "signature": signature}
+        for key in self._band_keys(signature):
+            self.buckets.setdefault(key, set()).add(doc_id)
+
+    def query(self, signature: List[int], exclude_id: Optional[str] = None) -> Optional[Dict]:
+        """Closest indexed document at or above the threshold, if any."""
+        with self._lock:
+            candidates = set()
+            for key in self._band_keys(signature):
+                candidates |= self.buckets.get(key, set())
+            candidates.discard(exclude_id)
+            best = None
+            for doc_id in candidates:
+                info = self.docs[doc_id]
+                sim = estimate_similarity(signature, info["signature"])
+                if sim >= self.threshold and (best is None or sim > best["similarity"]):
+                    best = {"id": doc_id, "filename": info["filename"], "similarity": round(sim, 3)}
+            return best
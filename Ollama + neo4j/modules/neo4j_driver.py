@@ -0,0 +1,223 @@
+import atexit
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from neo4j import AsyncGraphDatabase, GraphDatabase
+
+
+class _DriverManagerBase:
+    """Pool configuration and transaction counters shared by the sync and async managers."""
+
+    def __init__(self, uri: str, user: str, password: str,
+                 database: Optional[str] = None,
+                 max_pool_size: int = 50,
+                 acquisition_timeout: float = 30.0,
+                 max_connection_lifetime: float = 3600.0):
+        self.uri = uri
+        self.auth = (user, password)
+        self.database = database
+        self.max_pool_size = max_pool_size
+        self.acquisition_timeout = acquisition_timeout
+        self.max_connection_lifetime = max_connection_lifetime
+
+        self._driver = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "active_sessions": 0,
+            "peak_sessions": 0,
+            "read_transactions": 0,
+            "write_transactions": 0,
+            "failed_transactions": 0,
+            "total_tx_time_sec": 0.0,
+        }
+
+    def _driver_kwargs(self) -> Dict:
+        return {
+            "auth": self.auth,
+            "max_connection_pool_size": self.max_pool_size,
+            "connection_acquisition_timeout": self.acquisition_timeout,
+            "max_connection_lifetime": self.max_connection_lifetime,
+        }
+
+    def _session_kwargs(self) -> Dict:
+        return {"database": self.database} if self.database else {}
+
+    def _tx_started(self):
+        with self._stats_lock:
+            self._stats["active_sessions"] += 1
+            self._stats["peak_sessions"] = max(
+                self._stats["peak_sessions"], self._stats["active_sessions"]
+            )
+
+    def _tx_finished(self, mode: str, ok: bool, elapsed: float):
+        with self._stats_lock:
+            self._stats["active_sessions"] -= 1
+            self._stats["total_tx_time_sec"] += elapsed
+            if ok:
+                self._stats[f"{mode}_transactions"] += 1
+            else:
+                self._stats["failed_transactions"] += 1
+
+    # -----------------------------
+    # Stats
+    # -----------------------------
+    def pool_stats(self) -> Dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["total_tx_time_sec"] = round(stats["total_tx_time_sec"], 3)
+        stats["config"] = {
+            "uri": self.uri,
+            "database": self.database,
+            "max_pool_size": self.max_pool_size,
+            "acquisition_timeout": self.acquisition_timeout,
+            "max_connection_lifetime": self.max_connection_lifetime,
+        }
+        stats["connected"] = self._driver is not None
+        stats["pools"] = self._connection_pools()
+        return stats
+
+    def _connection_pools(self) -> Dict:
+        # The driver has no public pool API; inspect it best-effort so the
+        # stats endpoint keeps working if the internals change.
+        pools = {}
+        try:
+            connections = self._driver._pool.connections
+            for address, conns in list(connections.items()):
+                conns = list(conns)
+                in_use = sum(1 for c in conns if getattr(c, "in_use", False))
+                pools[str(address)] = {
+                    "open": len(conns),
+                    "in_use": in_use,
+                    "idle": len(conns) - in_use,
+                }
+        except Exception:
+            pass
+        return pools
+
+
+class Neo4jDriverManager(_DriverManagerBase):
+    """
+    Owns a single Neo4j driver for the lifetime of the process.
+
+    Read-only work goes through `read()` (managed read transaction, routed to
+    followers/read replicas in a cluster when the URI uses the neo4j://
+    scheme) and writes through `write()`.
+    The driver is created lazily on first use and closed at interpreter exit.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        atexit.register(self.close)
+
+    @property
+    def driver(self):
+        if self._driver is None:
+            with self._lock:
+                if self._driver is None:
+                    self._driver = GraphDatabase.driver(self.uri, **self._driver_kwargs())
+        return self._driver
+
+    def session(self):
+        return self.driver.session(**self._session_kwargs())
+
+    # -----------------------------
+    # Transactions
+    # -----------------------------
+    def read(self, work: Callable, *args, **kwargs) -> Any:
+        return self._execute("read", work, *args, **kwargs)
+
+    def write(self, work: Callable, *args, **kwargs) -> Any:
+        return self._execute("write", work, *args, **kwargs)
+
+    def run_read(self, query: str, **params) -> List:
+        # Records are materialised inside the transaction so callers can
+        # iterate them after the session has been returned to the pool.
+        return self.read(lambda tx: list(tx.run(query, params)))
+
+    def run_write(self, query: str, **params) -> List:
+        return self.write(lambda tx: list(tx.run(query, params)))
+
+    def _execute(self, mode: str, work: Callable, *args, **kwargs) -> Any:
+        self._tx_started()
+        start = time.time()
+        ok = False
+        try:
+            with self.session() as sess:
+                if mode == "read":
+                    result = sess.execute_read(work, *args, **kwargs)
+                else:
+                    result = sess.execute_write(work, *args, **kwargs)
+            ok = True
+            return result
+        finally:
+            self._tx_finished(mode, ok, time.time() - start)
+
+    def close(self):
+        with self._lock:
+            if self._driver is not None:
+                try:
+                    self._driver.close()
+                finally:
+                    self._driver = None
+
+
+class AsyncNeo4jDriverManager(_DriverManagerBase):
+    """
+    Async counterpart of Neo4jDriverManager for the ASGI app: same pool
+    settings and stats, but `read()`/`write()` take async transaction
+    functions and must be awaited. Call `close()` on server shutdown.
+    """
+
+    @property
+    def driver(self):
+        if self._driver is None:
+            self._driver = AsyncGraphDatabase.driver(self.uri, **self._driver_kwargs())
+        return self._driver
+
+    def session(self):
+        return self.driver.session(**self._session_kwargs())
+
+    # -----------------------------
+    # Transactions
+    # -----------------------------
+    async def read(self, work: Callable, *args, **kwargs) -> Any:
+        return await self._execute("read", work, *args, **kwargs)
+
+    async def write(self, work: Callable, *args, **kwargs) -> Any:
+        return await self._execute("write", work, *args, **kwargs)
+
+    async def run_read(self, query: str, **params) -> List:
+        async def work(tx):
+            result = await tx.run(query, params)
+            return [record async for record in result]
+        return await self.read(work)
+
+    async def run_write(self, query: str, **params) -> List:
+        async def work(tx):
+            result = await tx.run(query, params)
+            return [record async for record in result]
+        return await self.write(work)
+
+    async def _execute(self, mode: str, work: Callable, *args, **kwargs) -> Any:
+        self._tx_started()
+        start = time.time()
+        ok = False
+        try:
+            async with self.session() as sess:
+                if mode == "read":
+                    result = await sess.execute_read(work, *args, **kwargs)
+                else:
+                    result = await sess.execute_write(work, *args, **kwargs)
+            ok = True
+            return result
+        finally:
+            self._tx_finished(mode, ok, time.time() - start)
+
+    async def close(self):
+        if self._driver is not None:
+            try:
+                await self._driver.close()
+            finally:
+                self._driver = None
@@ -1,18 +1,52 @@
-from neo4j import GraphDatabase
-from typing import Dict
+from typing import Dict, List, Tuple
+from modules.neo4j_driver import AsyncNeo4jDriverManager, Neo4jDriverManager
+from modules.entity_normalizer import canonical_entities
+
+# Unique constraint doubles as the index behind every {id: ...} lookup
+SCHEMA_STATEMENTS = [
+    "CREATE CONSTRAINT document_id IF NOT EXISTS FOR (d:Document) REQUIRE d.id IS UNIQUE",
+]
 
 class Neo4jHandler:
-    def __init__(self, driver):
-        self.driver = driver
+    def __init__(self, db: Neo4jDriverManager):
+        self.db = db
+        self._schema_ready = False
+
+    def ensure_schema(self):
+        if self._schema_ready:
+            return
+        for statement in SCHEMA_STATEMENTS:
+            self.db.write(lambda tx: tx.run(statement).consume())
+        self._schema_ready = True
+
+    def create_document_graph(self, doc: Dict, link_near_duplicate: bool = True):
+        self.ensure_schema()
+        self.db.write(self._run_statements, Neo4jHandler.document_statements(doc, link_near_duplicate))
 
-    def create_document_graph(self, doc: Dict):
-        with self.driver.session() as session:
-            session.write_transaction(self._create_nodes_and_relationships, doc)
+    def link_near_duplicates(self, docs: List[Dict]):
+        """Second pass of a batch write, once every Document node exists."""
+        statements = Neo4jHandler.near_duplicate_statements(docs)
+        if statements:
+            self.db.write(self._run_statements, statements)
 
     @staticmethod
-    def _create_nodes_and_relationships(tx, doc: Dict):
+    def _run_statements(tx, statements: List[Tuple[str, Dict]]):
+        for query, params in statements:
+            tx.run(query, params)
+
+    @staticmethod
+    def document_statements(doc: Dict, link_near_duplicate: bool = True) -> List[Tuple[str, Dict]]:
+        """
+        Cypher statements that write one document's subgraph, in order.
+
+        Batch ingests pass link_near_duplicate=False and call
+        link_near_duplicates() after the loop: the matching copy may not be
+        written yet, and the edge needs both nodes.
+        """
+        statements = []
+
         # Merge Document node
-        tx.run("""
+        statements.append(("""
             MERGE (d:Document {id: $id})
             SET d.filename = $filename,
                 d.path = $path,
@@ -20,7 +54,8 @@ class Neo4jHandler:
                 d.page_count = $page_count,
                 d.content_length = $content_length,
                 d.summary = $summary,
-                d.ingested_at = $ingested_at
+                d.ingested_at = $ingested_at,
+                d.enrichment_tier = $enrichment_tier
         """, {
             "id": doc["id"],
             "filename": doc["filename"],
@@ -29,64 +64,157 @@ class Neo4jHandler:
             "page_count": doc["page_count"],
             "content_length": doc["content_length"],
             "summary": doc["overview_summary"],
-            "ingested_at": doc["ingested_at"]
-        })
+            "ingested_at": doc["ingested_at"],
+            "enrichment_tier": doc.get("enrichment_tier", "full")
+        }))
+
+        # Entity and client edges are rewritten from the canonical entities
+        # (and sitemap tags) on every write, so re-enrichment drops stale
+        # spellings and their orphaned nodes
+        entities = canonical_entities(doc.get("entities", {}))
+        statements.append(("""
+            MATCH (d:Document {id: $id})-[r:MENTIONS_TECHNOLOGY|PARTNERED_WITH|DESCRIBES_PRODUCT|MENTIONS_ORGANIZATION|BELONGS_TO]->(x)
+            DELETE r
+            WITH DISTINCT x
+            WHERE NOT (x)--()
+            DELETE x
+        """, {"id": doc["id"]}))
 
         # Merge Client node
         client = doc["tags"].get("client")
         if client and client != "Unknown":
-            tx.run("""
+            statements.append(("""
                 MERGE (c:Client {name: $client})
                 MERGE (d:Document {id: $id})
                 MERGE (d)-[:BELONGS_TO]->(c)
-            """, {"client": client, "id": doc["id"]})
+            """, {"client": client, "id": doc["id"]}))
+
+        # Merge Client nodes named in the text ("prepared for ..."); uploads
+        # are flattened to the root folder, so their sitemap client is Unknown
+        if entities["clients"]:
+            statements.append(("""
+                MERGE (d:Document {id: $id})
+                WITH d
+                UNWIND $names AS name
+                MERGE (c:Client {name: name})
+                MERGE (d)-[:BELONGS_TO]->(c)
+            """, {"names": entities["clients"], "id": doc["id"]}))
 
         # Merge Region node
         region = doc["tags"].get("region")
         if region and region != "Unknown":
-            tx.run("""
+            statements.append(("""
                 MERGE (r:Region {name: $region})
                 MERGE (d:Document {id: $id})
                 MERGE (d)-[:LOCATED_IN]->(r)
-            """, {"region": region, "id": doc["id"]})
+            """, {"region": region, "id": doc["id"]}))
 
         # Merge Domain node
         domain = doc["tags"].get("domain")
         if domain and domain != "Unknown":
-            tx.run("""
+            statements.append(("""
                 MERGE (dm:Domain {name: $domain})
                 MERGE (d:Document {id: $id})
                 MERGE (d)-[:PART_OF]->(dm)
-            """, {"domain": domain, "id": doc["id"]})
+            """, {"domain": domain, "id": doc["id"]}))
 
         # Merge Industry nodes
         for industry in doc.get("industry_tags", {}).get("industries", []):
-            tx.run("""
+            statements.append(("""
                 MERGE (i:Industry {name: $industry})
                 MERGE (d:Document {id: $id})
                 MERGE (d)-[:TAGGED_AS]->(i)
-            """, {"industry": industry, "id": doc["id"]})
+            """, {"industry": industry, "id": doc["id"]}))
 
         # Merge Technology nodes
-        for tech in doc.get("entities", {}).get("technologies", []):
-            tx.run("""
-                MERGE (t:Technology {name: $tech})
+        if entities["technologies"]:
+            statements.append(("""
                 MERGE (d:Document {id: $id})
+                WITH d
+                UNWIND $names AS name
+                MERGE (t:Technology {name: name})
                 MERGE (d)-[:MENTIONS_TECHNOLOGY]->(t)
-            """, {"tech": tech, "id": doc["id"]})
+            """, {"names": entities["technologies"], "id": doc["id"]}))
 
         # Merge Partner nodes
-        for partner in doc.get("entities", {}).get("partners", []):
-            tx.run("""
-                MERGE (p:Partner {name: $partner})
+        if entities["partners"]:
+            statements.append(("""
                 MERGE (d:Document {id: $id})
+                WITH d
+                UNWIND $names AS name
+                MERGE (p:Partner {name: name})
                 MERGE (d)-[:PARTNERED_WITH]->(p)
-            """, {"partner": partner, "id": doc["id"]})
+            """, {"names": entities["partners"], "id": doc["id"]}))
 
         # Merge Product nodes
-        for product in doc.get("entities", {}).get("products", []):
-            tx.run("""
-                MERGE (pr:Product {name: $product})
+        if entities["products"]:
+            statements.append(("""
                 MERGE (d:Document {id: $id})
+                WITH d
+                UNWIND $names AS name
+                MERGE (pr:Product {name: name})
                 MERGE (d)-[:DESCRIBES_PRODUCT]->(pr)
-            """, {"product": product, "id": doc["id"]})
+            """, {"names": entities["products"], "id": doc["id"]}))
+
+        # Merge Organization nodes (ORGs with no partner/client/product cue),
+        # one canonical node per name shared across documents
+        if entities["organizations"]:
+            statements.append(("""
+                MERGE (d:Document {id: $id})
+                WITH d
+                UNWIND $names AS name
+                MERGE (o:Organization {name: name})
+                MERGE (d)-[:MENTIONS_ORGANIZATION]->(o)
+            """, {"names": entities["organizations"], "id": doc["id"]}))
+
+        if link_near_duplicate:
+            statements.extend(Neo4jHandler.near_duplicate_statements([doc]))
+
+        return statements
+
+    @staticmethod
+    def near_duplicate_statements(docs: List[Dict]) -> List[Tuple[str, Dict]]:
+        """NEAR_DUPLICATE_OF edges (MinHash/LSH matches found at ingest) for `docs`."""
+        pairs = [{"id": doc["id"], "other_id": doc["near_duplicate_of"]["id"],
+                  "similarity": doc["near_duplicate_of"]["similarity"]}
+                 for doc in docs if doc.get("near_duplicate_of")]
+        if not pairs:
+            return []
+        # MATCH, not MERGE: an id the LSH index still holds but the graph
+        # no longer has must not come back as an empty Document node
+        return [("""
+            UNWIND $pairs AS pair
+            MATCH (d:Document {id: pair.id})
+            MATCH (o:Document {id: pair.other_id})
+            MERGE (d)-[r:NEAR_DUPLICATE_OF]->(o)
+            SET r.similarity = pair.similarity
+        """, {"pairs": pairs})]
+
+class AsyncNeo4jHandler:
+    """Same writes as Neo4jHandler, through the async driver (ASGI mode)."""
+
+    def __init__(self, db: AsyncNeo4jDriverManager):
+        self.db = db
+        self._schema_ready = False
+
+    async def ensure_schema(self):
+        if self._schema_ready:
+            return
+        for statement in SCHEMA_STATEMENTS:
+            await self.db.write(self._run_statements, [(statement, {})])
+        self._schema_ready = True
+
+    async def create_document_graph(self, doc: Dict, link_near_duplicate: bool = True):
+        await self.ensure_schema()
+        await self.db.write(self._run_statements, Neo4jHandler.document_statements(doc, link_near_duplicate))
+
+    async def link_near_duplicates(self, docs: List[Dict]):
+        statements = Neo4jHandler.near_duplicate_statements(docs)
+        if statements:
+            await self.db.write(self._run_statements, statements)
+
+    @staticmethod
+    async def _run_statements(tx, statements: List[Tuple[str, Dict]]):
+        for query, params in statements:
+            result = await tx.run(query, params)
+            await result.consume()
@@ -15,24 +15,44 @@ def ask_llama(prompt: str, model: str = "llama3") -> str:
     except Exception as e:
         return f"Error calling Ollama: {e}" '''
         
-import requests
+import asyncio
+import os
 
-class NIMChatClient:
-    def __init__(self, api_key, api_base="https://integrate.api.nvidia.com/v1", model="meta/llama-3.1-70b-instruct"):
+# httpx is a core dependency: every LLM call, from the Flask app too, goes
+# through AsyncNIMChatClient on the scheduler's event loop.
+import httpx
+
+from modules.llm_scheduler import LLMDeadlineExceeded, LLMQueueFull, LLMScheduler
+
+class AsyncNIMChatClient:
+    """NVIDIA NIM chat client over a pooled httpx connection, called from the LLM scheduler's loop."""
+
+    def __init__(self, api_key, api_base="https://integrate.api.nvidia.com/v1", model="meta/llama-3.1-70b-instruct",
+                 max_connections=200):
         self.api_key = api_key
         self.api_base = api_base.rstrip("/")
         self.model = model
         self.endpoints = [
             f"{self.api_base}/chat/completions",
         ]
+        self.max_connections = max_connections
+        self._http = None
 
-    def ask_llama(self, prompt: str, temperature=0.3, retries=3, delay=5) -> str:
+    def _client(self):
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                timeout=30,
+                limits=httpx.Limits(max_connections=self.max_connections)
+            )
+        return self._http
+
+    async def ask_llama(self, prompt: str, temperature=0.3, retries=3, delay=5, model=None) -> str:
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
         data = {
-            "model": self.model,
+            "model": model or self.model,
             "messages": [
                 {"role": "user", "content": prompt}
             ],
@@ -41,33 +61,85 @@ class NIMChatClient:
         for endpoint in self.endpoints:
             for attempt in range(retries):
                 try:
-                    response = requests.post(endpoint, headers=headers, json=data, timeout=30)
+                    response = await self._client().post(endpoint, headers=headers, json=data)
                     if response.status_code == 404:
-                        continue  # Try next endpoint
+                        break  # Try next endpoint
+                    if response.status_code == 429:
+                        wait_time = min(delay * (2 ** attempt), 15)
+                        print(f"Rate limit hit. Retrying in {wait_time} seconds... ({attempt + 1}/{retries})")
+                        await asyncio.sleep(wait_time)
+                        continue
                     response.raise_for_status()
                     ai_response = response.json()
                     if "choices" in ai_response and ai_response["choices"]:
                         return ai_response["choices"][0]["message"]["content"]
                     else:
                         return "AI response unavailable."
-                except requests.exceptions.RequestException as e:
-                    if "429" in str(e):
-                        import time
-                        wait_time = min(delay * (2 ** attempt), 15)
-                        print(f"Rate limit hit. Retrying in {wait_time} seconds... ({attempt + 1}/{retries})")
-                        time.sleep(wait_time)
-                    else:
-                        print(f"Error calling NVIDIA NIM: {e}")
-                        return "AI response unavailable."
+                except Exception as e:
+                    # Transport errors, non-JSON bodies, malformed choices
+                    print(f"Error calling NVIDIA NIM: {e}")
+                    return "AI response unavailable."
         return "Failed to get data."
 
-# --- Hardcode your API key here ---
-NVIDIA_API_KEY = "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"
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+# --- Hardcode your API key here (NVIDIA_API_KEY / NIM_API_BASE override) ---
+NVIDIA_API_KEY = os.environ.get("NVIDIA_API_KEY") or "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"
+NIM_API_BASE = os.environ.get("NIM_API_BASE", "https://integrate.api.nvidia.com/v1")
+
+# --- Scheduler in front of every LLM call ---
+# All callers (Flask threads and the ASGI loop) share one priority queue and
+# one concurrency cap sized to the provider quota; identical in-flight
+# prompts are answered by a single call.
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", 4))
+LLM_MAX_QUEUE = int(os.environ.get("LLM_MAX_QUEUE", 1000))
+LLM_INTERACTIVE_TIMEOUT = float(os.environ.get("LLM_INTERACTIVE_TIMEOUT", 60))
 
-# --- Create a global client instance ---
-nim_client = NIMChatClient(NVIDIA_API_KEY)
+async_nim_client = AsyncNIMChatClient(NVIDIA_API_KEY, NIM_API_BASE, max_connections=LLM_MAX_CONCURRENCY)
+
+llm_scheduler = LLMScheduler(
+    lambda prompt, model: async_nim_client.ask_llama(prompt, model=model),
+    max_concurrency=LLM_MAX_CONCURRENCY,
+    max_queue=LLM_MAX_QUEUE
+)
+
+def _default_timeout(priority: str):
+    # Interactive callers give up after LLM_INTERACTIVE_TIMEOUT; batch jobs wait
+    return LLM_INTERACTIVE_TIMEOUT if priority == "interactive" else None
 
 # --- Drop-in replacement function ---
-def ask_llama(prompt: str, model: str = "meta/llama-3.1-70b-instruct") -> str:
-    nim_client.model = model
-    return nim_client.ask_llama(prompt)
+def ask_llama(prompt: str, model: str = "meta/llama-3.1-70b-instruct",
+              priority: str = "interactive", timeout: float = None) -> str:
+    if not isinstance(prompt, str) or not prompt.strip():
+        return "Invalid prompt."
+    if timeout is None:
+        timeout = _default_timeout(priority)
+    try:
+        return llm_scheduler.submit(prompt, model, priority, timeout).result()
+    except LLMDeadlineExceeded:
+        return "AI response timed out."
+    except LLMQueueFull:
+        return "AI is busy, please retry shortly."
+    except Exception as e:
+        print(f"LLM call failed: {e}")
+        return "AI response unavailable."
+
+# --- Async variant for the ASGI app ---
+async def ask_llama_async(prompt: str, model: str = "meta/llama-3.1-70b-instruct",
+                          priority: str = "interactive", timeout: float = None) -> str:
+    if not isinstance(prompt, str) or not prompt.strip():
+        return "Invalid prompt."
+    if timeout is None:
+        timeout = _default_timeout(priority)
+    try:
+        return await asyncio.wrap_future(llm_scheduler.submit(prompt, model, priority, timeout))
+    except LLMDeadlineExceeded:
+        return "AI response timed out."
+    except LLMQueueFull:
+        return "AI is busy, please retry shortly."
+    except Exception as e:
+        print(f"LLM call failed: {e}")
+        return "AI response unavailable."
@@ -0,0 +1,250 @@
+import asyncio
+import multiprocessing
+import os
+import random
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+from langdetect import detect
+
+from modules import metadata_extractors
+from modules.near_duplicates import MinHash
+
+# Defaults; app.py passes its own config values through
+MAX_DOC_MEMORY_CHARS = 400_000     # text buffered per document across all workers
+PARALLEL_PAGE_THRESHOLD = 150      # page count above which ranges are split across processes
+PAGES_PER_RANGE = 50
+MAX_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+MIN_RANGE_CHARS = 10_000           # smallest useful buffer per worker; fewer workers run below it
+LANGUAGE_SAMPLE_CHARS = 5000
+
+# Fast tier sampling: leading/trailing pages plus a few random windows
+FAST_FIRST_PAGES = 3
+FAST_LAST_PAGES = 2
+FAST_RANDOM_WINDOWS = 2
+FAST_WINDOW_PAGES = 2
+FAST_TIME_BUDGET_SEC = 3.0
+FAST_MAX_CHARS = 50_000
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+# -----------------------------
+# Page streaming
+# -----------------------------
+def iter_pdf_pages(file_path: str, start: int = 0, end: Optional[int] = None) -> Iterator[str]:
+    """Yield the text of pages [start, end) one at a time."""
+    with fitz.open(file_path) as doc:
+        stop = doc.page_count if end is None else min(end, doc.page_count)
+        for i in range(start, stop):
+            page = doc.load_page(i)
+            yield page.get_text("text")
+            page = None  # release the page before loading the next one
+
+def iter_pdf_page_subset(file_path: str, pages: List[int]) -> Iterator[str]:
+    with fitz.open(file_path) as doc:
+        for i in pages:
+            if 0 <= i < doc.page_count:
+                page = doc.load_page(i)
+                yield page.get_text("text")
+                page = None
+
+def sample_page_indices(page_count: int, seed: str = "",
+                        first: int = FAST_FIRST_PAGES,
+                        last: int = FAST_LAST_PAGES,
+                        windows: int = FAST_RANDOM_WINDOWS,
+                        window_pages: int = FAST_WINDOW_PAGES) -> List[int]:
+    """Sorted page indices for the fast tier; deterministic for a given seed."""
+    picked = set(range(min(first, page_count)))
+    picked.update(range(max(page_count - last, 0), page_count))
+    middle_start, middle_end = first, page_count - last - window_pages
+    if middle_end > middle_start:
+        rng = random.Random(seed)
+        for _ in range(windows):
+            start = rng.randint(middle_start, middle_end)
+            picked.update(range(start, start + window_pages))
+    return sorted(picked)
+
+def page_ranges(page_count: int, per_range: int) -> List[Tuple[int, int]]:
+    return [(s, min(s + per_range, page_count)) for s in range(0, page_count, per_range)]
+
+def enrich_page_range(file_path: str, start: int, end: Optional[int],
+                      max_chars: int, head_chars: int) -> Dict:
+    """Worker entry point: enrich one page range and return a mergeable state."""
+    acc = metadata_extractors.EnrichmentAccumulator(max_chars=max_chars, head_chars=head_chars)
+    minhash = MinHash()
+    for page_text in iter_pdf_pages(file_path, start, end):
+        acc.add_page(page_text)
+        minhash.update(page_text)
+    state = acc.state()
+    state["minhash"] = minhash.mins
+    return state
+
+def scan_pdf(file_path: str, preview_chars: int = 1500) -> Dict:
+    """
+    Cheap pass without NLP: text statistics, head and MinHash signature.
+    Used to look for a near-duplicate before paying for enrichment.
+    """
+    head_chars = max(preview_chars, LANGUAGE_SAMPLE_CHARS)
+    acc = metadata_extractors.EnrichmentAccumulator(head_chars=head_chars, analyse=False)
+    minhash = MinHash()
+    for page_text in iter_pdf_pages(file_path):
+        acc.add_page(page_text)
+        minhash.update(page_text)
+    return {
+        "word_count": acc.word_count,
+        "summary_head": acc.head[:300],
+        "content_length": acc.char_count,
+        "content_preview": acc.head[:preview_chars],
+        "language_sample": acc.head[:LANGUAGE_SAMPLE_CHARS],
+        "minhash": minhash.signature(),
+    }
+
+def detect_language(text: str) -> str:
+    try:
+        return detect(text)
+    except Exception:
+        return "unknown"
+
+def _fast_enrich_pages(file_path: str, pages: List[int], head_chars: int, time_budget_sec: float):
+    """Fast-tier worker: read and enrich `pages` until the budget is spent."""
+    deadline = time.monotonic() + time_budget_sec
+    acc = metadata_extractors.EnrichmentAccumulator(max_chars=FAST_MAX_CHARS, head_chars=head_chars,
+                                                    deadline=deadline)
+    minhash = MinHash()
+    read = []
+    for idx, page_text in zip(pages, iter_pdf_page_subset(file_path, pages)):
+        acc.add_page(page_text)
+        minhash.update(page_text)
+        read.append(idx)
+        if time.monotonic() >= deadline:
+            break
+    acc.flush()
+    return acc, minhash, read
+
+def _get_executor(max_workers: int) -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # Request threads, the full-tier thread and the ASGI loop can all get
+        # here first; each extra pool would start its own spaCy workers
+        with _executor_lock:
+            if _executor is None:
+                # The server is multi-threaded by the time the pool starts (request
+                # threads, LLM scheduler, driver pool), so never fork it directly.
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                _executor = ProcessPoolExecutor(max_workers=max_workers,
+                                                mp_context=multiprocessing.get_context(method))
+    return _executor
+
+async def run_cpu(fn, *args, in_process_pool: bool = False, max_workers: int = MAX_WORKERS):
+    """
+    Run CPU-bound work off the event loop: in a thread by default, or in the
+    process pool so it does not hold the server process's GIL (ASGI mode).
+    """
+    if in_process_pool and max_workers >= 1:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_executor(max_workers), fn, *args)
+    return await asyncio.to_thread(fn, *args)
+
+# -----------------------------
+# Main async entry point
+# -----------------------------
+async def stream_enrich_pdf(file_path: str, page_count: int,
+                            preview_chars: int = 1500,
+                            max_doc_chars: int = MAX_DOC_MEMORY_CHARS,
+                            parallel_threshold: int = PARALLEL_PAGE_THRESHOLD,
+                            pages_per_range: int = PAGES_PER_RANGE,
+                            max_workers: int = MAX_WORKERS) -> Dict:
+    """
+    Extract and enrich a PDF without holding its full text in memory.
+
+    Small documents are streamed page by page in a thread. Documents above
+    `parallel_threshold` pages (all of them when it is 0) are split into
+    page ranges enriched in worker processes. `max_doc_chars` is shared
+    between the ranges running at once (fewer run when a share would drop
+    below MIN_RANGE_CHARS), so the document's text buffer stays within it.
+
+    Returns the enrichment plus the fields process_pdf used to derive from
+    the full text: content_length, content_preview and language_sample, and
+    the document's MinHash signature.
+    """
+    head_chars = max(preview_chars, LANGUAGE_SAMPLE_CHARS)
+    ranges = page_ranges(page_count, pages_per_range)
+
+    if page_count <= parallel_threshold or max_workers < 1:
+        states = [await asyncio.to_thread(
+            enrich_page_range, file_path, 0, None, max_doc_chars, head_chars
+        )]
+    else:
+        # Run fewer ranges at once rather than exceed max_doc_chars in total
+        workers = max(1, min(max_workers, len(ranges), max_doc_chars // MIN_RANGE_CHARS))
+        per_worker_chars = max_doc_chars // workers
+        loop = asyncio.get_running_loop()
+        executor = _get_executor(max_workers)
+        sem = asyncio.Semaphore(workers)
+
+        async def run_range(start: int, end: int) -> Dict:
+            async with sem:
+                return await loop.run_in_executor(
+                    executor, enrich_page_range,
+                    file_path, start, end, per_worker_chars, head_chars
+                )
+
+        states = await asyncio.gather(*(run_range(s, e) for s, e in ranges))
+
+    acc = metadata_extractors.EnrichmentAccumulator(max_chars=max_doc_chars, head_chars=head_chars)
+    minhash = MinHash()
+    for state in states:
+        acc.merge(state)
+        minhash.merge(state["minhash"])
+
+    return {
+        "enrichment": acc.result(page_count),
+        "content_length": acc.char_count,
+        "content_preview": acc.head[:preview_chars],
+        "language_sample": acc.head[:LANGUAGE_SAMPLE_CHARS],
+        "minhash": minhash.signature(),
+    }
+
+async def fast_enrich_pdf(file_path: str, page_count: int,
+                          preview_chars: int = 1500,
+                          time_budget_sec: float = FAST_TIME_BUDGET_SEC,
+                          seed: str = "",
+                          in_process_pool: bool = False,
+                          max_workers: int = MAX_WORKERS) -> Dict:
+    """
+    Fast tier: enrich sampled pages only, within the time budget (page reads
+    and spaCy passes both stop when it is spent). Word count and content
+    length are extrapolated from the pages actually read. Returns the same
+    shape as `stream_enrich_pdf` plus `complete`: when the sample covered
+    every page with nothing cut, the result equals the full tier's and
+    carries the MinHash; otherwise the MinHash is left out, since a sample
+    is not comparable to full documents. `in_process_pool` runs the sample
+    in a worker process instead of a thread (see `run_cpu`).
+    """
+    head_chars = max(preview_chars, LANGUAGE_SAMPLE_CHARS)
+    pages = sample_page_indices(page_count, seed=seed)
+
+    acc, minhash, read = await run_cpu(
+        _fast_enrich_pages, file_path, pages, head_chars, time_budget_sec,
+        in_process_pool=in_process_pool, max_workers=max_workers
+    )
+    complete = len(read) == page_count and not acc.truncated
+    scale = page_count / len(read) if read else 0
+    enrichment = acc.result(page_count)
+    if not complete:
+        enrichment["content_summary"]["word_count"] = int(acc.word_count * scale)
+        enrichment["content_summary"]["estimated"] = True
+        enrichment["content_summary"]["sampled_pages"] = read
+
+    return {
+        "enrichment": enrichment,
+        "content_length": acc.char_count if complete else int(acc.char_count * scale),
+        "content_preview": acc.head[:preview_chars],
+        "language_sample": acc.head[:LANGUAGE_SAMPLE_CHARS],
+        "minhash": minhash.signature() if complete else None,
+        "complete": complete,
+    }
@@ -1,13 +1,10 @@
-import os
-import json
 from typing import Dict, List, Tuple
-from neo4j import Driver
+from modules import metadata_store
+from modules.neo4j_driver import AsyncNeo4jDriverManager, Neo4jDriverManager
 
 def load_metadata(metadata_path: str) -> List[Dict]:
-    if not os.path.exists(metadata_path):
-        return []
-    with open(metadata_path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    # Accepts the JSON Lines store as well as a legacy JSON list
+    return metadata_store.load_records(metadata_path)
 
 def keyword_filter(docs: List[Dict], query: str, top_k: int = 5) -> List[Dict]:
     q = query.lower()
@@ -22,17 +19,21 @@ def keyword_filter(docs: List[Dict], query: str, top_k: int = 5) -> List[Dict]:
     scored.sort(key=lambda x: -x[0])
     return [d for _, d in scored[:top_k]]
 
-def neo4j_related(driver: Driver, current_doc_id: str, top_k: int = 8) -> List[Tuple[str, str]]:
-    # Find documents connected via shared Industry/Technology/Client
-    query = """
-    MATCH (d:Document {id: $doc_id})-[]->(x)<-[]-(other:Document)
-    WHERE other.id <> $doc_id
-    RETURN other.filename AS filename, labels(x)[0] AS via_label
-    LIMIT $top_k
-    """
-    with driver.session() as sess:
-        res = sess.run(query, doc_id=current_doc_id, top_k=top_k)
-        return [(r["filename"], r["via_label"]) for r in res]
+# Precomputed top-k neighbours (see modules.similarity), best first
+RELATED_DOCS_QUERY = """
+MATCH (d:Document {id: $doc_id})-[r:SIMILAR_TO]->(other:Document)
+RETURN other.filename AS filename, r.score AS score
+ORDER BY r.score DESC
+LIMIT $top_k
+"""
+
+def neo4j_related(db: Neo4jDriverManager, current_doc_id: str, top_k: int = 8) -> List[Tuple[str, float]]:
+    res = db.run_read(RELATED_DOCS_QUERY, doc_id=current_doc_id, top_k=top_k)
+    return [(r["filename"], r["score"]) for r in res]
+
+async def neo4j_related_async(db: AsyncNeo4jDriverManager, current_doc_id: str, top_k: int = 8) -> List[Tuple[str, float]]:
+    res = await db.run_read(RELATED_DOCS_QUERY, doc_id=current_doc_id, top_k=top_k)
+    return [(r["filename"], r["score"]) for r in res]
 
 def build_context_snippets(docs: List[Dict], filenames: List[str]) -> str:
     by_name = {d.get("filename"): d for d in docs}
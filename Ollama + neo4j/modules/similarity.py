@@ -0,0 +1,243 @@
+import asyncio
+import math
+import threading
+from collections import defaultdict
+from typing import TYPE_CHECKING, Dict, List, Set, Tuple
+
+from modules.entity_normalizer import canonical_entities
+
+if TYPE_CHECKING:  # scoring itself needs no driver
+    from modules.neo4j_driver import AsyncNeo4jDriverManager, Neo4jDriverManager
+
+TOP_K = 10
+MIN_SCORE = 0.05
+# Features carried by more than this share of documents (e.g. the
+# "Technology" industry) say nothing about similarity and are ignored once
+# the corpus has at least MIN_DOCS_FOR_DF_CUTOFF documents.
+MAX_DF_RATIO = 0.5
+MIN_DOCS_FOR_DF_CUTOFF = 20
+WRITE_BATCH_SIZE = 500
+
+# Replaces each row's outgoing SIMILAR_TO edges with its current top-k
+WRITE_NEIGHBORS_QUERY = """
+    UNWIND $rows AS row
+    MATCH (d:Document {id: row.id})
+    OPTIONAL MATCH (d)-[old:SIMILAR_TO]->()
+    DELETE old
+    WITH DISTINCT d, row
+    UNWIND row.neighbors AS n
+    MATCH (o:Document {id: n.id})
+    MERGE (d)-[r:SIMILAR_TO]->(o)
+    SET r.score = n.score
+"""
+
+# Relationship type -> feature label, as written by Neo4jHandler
+FEATURE_RELATIONSHIPS = {
+    "TAGGED_AS": "Industry",
+    "MENTIONS_TECHNOLOGY": "Technology",
+    "PARTNERED_WITH": "Partner",
+    "BELONGS_TO": "Client",
+    "MENTIONS_ORGANIZATION": "Organization",
+}
+
+def document_features(doc: Dict) -> Set[str]:
+    """Feature keys ("Label:name") for a metadata dict, matching the graph edges."""
+    feats = set()
+    for industry in doc.get("industry_tags", {}).get("industries", []):
+        feats.add(f"Industry:{industry}")
+    entities = canonical_entities(doc.get("entities", {}))
+    for tech in entities.get("technologies", []):
+        feats.add(f"Technology:{tech}")
+    for partner in entities.get("partners", []):
+        feats.add(f"Partner:{partner}")
+    for org in entities.get("organizations", []):
+        feats.add(f"Organization:{org}")
+    for client in entities.get("clients", []):
+        feats.add(f"Client:{client}")
+    client = doc.get("tags", {}).get("client")
+    if client and client != "Unknown":
+        feats.add(f"Client:{client}")
+    return feats
+
+class DocumentSimilarity:
+    """
+    IDF-weighted Jaccard similarity between documents over their shared
+    industries, technologies, partners, clients and organisations, kept in
+    Neo4j as the top-k `(:Document)-[:SIMILAR_TO {score}]->(:Document)` edges
+    per document.
+
+    The feature matrix is held sparsely (postings per feature, features per
+    document) and loaded from the graph on first use. `rebuild()` recomputes
+    every document; `add_document()` scores one new or changed document
+    against documents sharing a feature and patches only the affected edges.
+    IDF drifts as the corpus grows, so run `rebuild()` periodically.
+    `add_document_async()` does the same patch through the async driver,
+    holding the in-memory lock only while scoring.
+    """
+
+    def __init__(self, db: "Neo4jDriverManager", top_k: int = TOP_K, min_score: float = MIN_SCORE,
+                 max_df_ratio: float = MAX_DF_RATIO):
+        self.db = db
+        self.top_k = top_k
+        self.min_score = min_score
+        self.max_df_ratio = max_df_ratio
+        self.features: Dict[str, Set[str]] = {}
+        self.postings: Dict[str, Set[str]] = defaultdict(set)
+        self.neighbors: Dict[str, List[Tuple[str, float]]] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._async_write_lock = None  # created on the serving event loop
+
+    # -----------------------------
+    # Sparse matrix maintenance
+    # -----------------------------
+    def _load(self):
+        if self._loaded:
+            return
+        rels = "|".join(FEATURE_RELATIONSHIPS)
+        features: Dict[str, Set[str]] = {}
+        for rec in self.db.run_read(f"""
+            MATCH (d:Document)
+            OPTIONAL MATCH (d)-[r:{rels}]->(x)
+            RETURN d.id AS id, type(r) AS rel, x.name AS name
+        """):
+            feats = features.setdefault(rec["id"], set())
+            if rec["rel"]:
+                feats.add(f"{FEATURE_RELATIONSHIPS[rec['rel']]}:{rec['name']}")
+        for doc_id, feats in features.items():
+            self._set_features(doc_id, feats)
+        for rec in self.db.run_read("""
+            MATCH (d:Document)-[r:SIMILAR_TO]->(o:Document)
+            RETURN d.id AS id, o.id AS other, r.score AS score
+        """):
+            self.neighbors.setdefault(rec["id"], []).append((rec["other"], rec["score"]))
+        for doc_id in self.neighbors:
+            self.neighbors[doc_id].sort(key=lambda x: -x[1])
+        self._loaded = True
+
+    def _set_features(self, doc_id: str, feats: Set[str]):
+        for f in self.features.get(doc_id, ()):
+            self.postings[f].discard(doc_id)
+            if not self.postings[f]:
+                del self.postings[f]
+        self.features[doc_id] = set(feats)
+        for f in feats:
+            self.postings[f].add(doc_id)
+
+    def _idf(self, feature: str) -> float:
+        n, df = len(self.features), len(self.postings.get(feature, ()))
+        if df == 0:
+            return 0.0
+        if n >= MIN_DOCS_FOR_DF_CUTOFF and df / n > self.max_df_ratio:
+            return 0.0
+        return math.log((1 + n) / (1 + df)) + 1.0
+
+    def _scores(self, doc_id: str) -> Dict[str, float]:
+        weights = {f: self._idf(f) for f in self.features.get(doc_id, ())}
+        weights = {f: w for f, w in weights.items() if w > 0}
+        total_a = sum(weights.values())
+        if total_a == 0:
+            return {}
+        intersection = defaultdict(float)
+        for f, w in weights.items():
+            for other in self.postings[f]:
+                if other != doc_id:
+                    intersection[other] += w
+        scores = {}
+        for other, inter in intersection.items():
+            total_b = sum(self._idf(f) for f in self.features[other])
+            union = total_a + total_b - inter
+            score = inter / union if union > 0 else 0.0
+            if score >= self.min_score:
+                scores[other] = round(score, 4)
+        return scores
+
+    def _top_k(self, scores: Dict[str, float]) -> List[Tuple[str, float]]:
+        return sorted(scores.items(), key=lambda x: (-x[1], x[0]))[:self.top_k]
+
+    # -----------------------------
+    # Jobs
+    # -----------------------------
+    def rebuild(self) -> int:
+        """Recompute top-k neighbours for every document and rewrite all edges."""
+        with self._lock:
+            self._loaded = False
+            self.features, self.postings, self.neighbors = {}, defaultdict(set), {}
+            self._load()
+            self.neighbors = {doc_id: self._top_k(self._scores(doc_id)) for doc_id in self.features}
+            self.db.write(lambda tx: tx.run("MATCH ()-[r:SIMILAR_TO]->() DELETE r").consume())
+            self._write(list(self.neighbors))
+            return len(self.neighbors)
+
+    def add_document(self, doc: Dict):
+        """Score a newly written (or re-enriched) document and patch affected edges."""
+        with self._lock:
+            self._write(self._patch(doc))
+
+    async def add_document_async(self, doc: Dict, db: "AsyncNeo4jDriverManager"):
+        """
+        add_document for the ASGI app: scoring (and the first graph load) run
+        in a thread, edges are written through the async driver. Writes are
+        ordered by an asyncio lock so a later patch never lands first.
+        """
+        if self._async_write_lock is None:
+            self._async_write_lock = asyncio.Lock()
+        async with self._async_write_lock:
+            rows = await asyncio.to_thread(self._patch_rows, doc)
+            for i in range(0, len(rows), WRITE_BATCH_SIZE):
+                await db.write(self._write_neighbors_async, rows[i:i + WRITE_BATCH_SIZE])
+
+    def _patch_rows(self, doc: Dict) -> List[Dict]:
+        with self._lock:
+            return self._rows(self._patch(doc))
+
+    def _patch(self, doc: Dict) -> List[str]:
+        """Update the in-memory neighbours for `doc`; returns the documents whose lists changed."""
+        self._load()
+        doc_id = doc["id"]
+        self._set_features(doc_id, document_features(doc))
+        scores = self._scores(doc_id)
+        self.neighbors[doc_id] = self._top_k(scores)
+        changed = [doc_id]
+
+        for other, current in self.neighbors.items():
+            if other == doc_id:
+                continue
+            had = any(n == doc_id for n, _ in current)
+            score = scores.get(other)
+            if score is None and not had:
+                continue
+            kept = [(n, s) for n, s in current if n != doc_id]
+            if score is not None:
+                kept.append((doc_id, score))
+            updated = self._top_k(dict(kept))
+            if updated != current:
+                self.neighbors[other] = updated
+                changed.append(other)
+        # Documents with no neighbours yet are not in self.neighbors
+        for other, score in scores.items():
+            if other not in self.neighbors:
+                self.neighbors[other] = [(doc_id, score)]
+                changed.append(other)
+
+        return changed
+
+    def _rows(self, doc_ids: List[str]) -> List[Dict]:
+        return [
+            {"id": d, "neighbors": [{"id": n, "score": s} for n, s in self.neighbors.get(d, [])]}
+            for d in doc_ids
+        ]
+
+    def _write(self, doc_ids: List[str]):
+        rows = self._rows(doc_ids)
+        for i in range(0, len(rows), WRITE_BATCH_SIZE):
+            self.db.write(self._write_neighbors, rows[i:i + WRITE_BATCH_SIZE])
+
+    @staticmethod
+    def _write_neighbors(tx, rows: List[Dict]):
+        tx.run(WRITE_NEIGHBORS_QUERY, {"rows": rows})
+
+    @staticmethod
+    async def _write_neighbors_async(tx, rows: List[Dict]):
+        result = await tx.run(WRITE_NEIGHBORS_QUERY, {"rows": rows})
+        await result.consume()
@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+from modules import entity_normalizer
+from modules.entity_normalizer import (
+    add_vote, canonical_entities, clean_surface, entity_key, load_gazetteer, merge_votes, resolve_roles,
+)
+
+@pytest.mark.parametrize("raw, cleaned", [
+    ("  The  Acme Corp. ", "Acme"),
+    ("Capgemini’s", "Capgemini"),
+    ("• Globex, Inc.:", "Globex"),
+    ("Partners'", "Partners"),
+])
+def test_clean_surface_strips_layout_and_legal_noise(raw, cleaned):
+    assert clean_surface(raw) == cleaned
+
+def test_spelling_variants_share_one_key():
+    assert entity_key("CAPGEMINI") == entity_key("Capgemini's") == entity_key("the Capgemini") == "capgemini"
+
+def test_layout_junk_is_not_an_entity():
+    votes = {}
+    for junk in ("12345", "x", "a span that is far too many words long", "Z" * 61):
+        add_vote(votes, junk, "partners")
+    assert votes == {}
+
+def test_gazetteer_resolves_aliases_and_prefixes():
+    gazetteer = entity_normalizer.gazetteer
+
+    assert gazetteer.lookup("Microsoft Azure") == ("Azure", "technologies")
+    assert gazetteer.lookup("Capgemini America, Inc.") == ("Capgemini", None)
+    assert gazetteer.lookup("Capgemini Project Team") == ("Capgemini", None)
+    assert gazetteer.lookup("Azure DevOps") is None
+    assert list(gazetteer.scan("we run k8s on amazon web services".split())) == [
+        ("Kubernetes", "technologies"), ("AWS", "technologies")]
+
+def test_default_gazetteer_drops_no_organisation():
+    assert all(spec.get("role") != entity_normalizer.IGNORE_ROLE
+               for spec in entity_normalizer.DEFAULT_GAZETTEER.values())
+
+def test_one_role_per_entity():
+    votes = {}
+    add_vote(votes, "Nike", "clients", count=2)
+    add_vote(votes, "NIKE", "partners")
+    add_vote(votes, "Globex", "organizations")
+    add_vote(votes, "Initech", "partners")
+    add_vote(votes, "Initech", "clients")
+    add_vote(votes, "Microsoft Corporation", "clients")
+
+    roles = resolve_roles(votes)
+    assert roles["clients"] == ["Nike"]
+    # No cue, or a tie between cues, leaves the name unassigned
+    assert sorted(roles["organizations"]) == ["Globex", "Initech"]
+    # The gazetteer role beats sentence cues
+    assert roles["partners"] == ["Microsoft"]
+
+def test_merge_votes_adds_mentions_across_worker_ranges():
+    first, second = {}, {}
+    add_vote(first, "Nike", "clients")
+    add_vote(second, "Nike's", "clients")
+    add_vote(second, "Globex", "organizations")
+    merge_votes(first, second)
+
+    assert first[entity_key("Nike")]["roles"] == {"clients": 2}
+    assert set(first) == {"nike", "globex"}
+
+def test_candidate_cap_keeps_known_entities_counting():
+    votes = {}
+    add_vote(votes, "Nike", "clients", max_entities=1)
+    add_vote(votes, "Globex", "clients", max_entities=1)
+    add_vote(votes, "NIKE", "clients", max_entities=1)
+
+    assert list(votes) == ["nike"] and votes["nike"]["roles"]["clients"] == 2
+
+def test_legacy_records_listing_every_org_under_each_role_are_deduped():
+    spellings = ["Capgemini", "CAPGEMINI", "Capgemini's", "Capgemini Group", "Microsoft"]
+    entities = canonical_entities({"partners": spellings, "clients": spellings, "products": spellings})
+
+    assert entities["organizations"] == ["Capgemini"]
+    assert entities["partners"] == ["Microsoft"]
+    assert entities["clients"] == entities["products"] == []
+    # Idempotent on its own output
+    assert canonical_entities(entities) == entities
+
+def test_deployments_can_ignore_names_through_a_gazetteer_file(tmp_path, monkeypatch):
+    path = tmp_path / "gazetteer.json"
+    path.write_text(json.dumps({"Capgemini": {"role": "ignore", "prefix": True},
+                                "Nike": {"role": "clients"}}), encoding="utf-8")
+    monkeypatch.setattr(entity_normalizer, "gazetteer", load_gazetteer(str(path)))
+
+    entities = canonical_entities({"organizations": ["Capgemini America", "Nike", "Globex"]})
+    assert entities["organizations"] == ["Globex"]
+    assert entities["clients"] == ["Nike"]
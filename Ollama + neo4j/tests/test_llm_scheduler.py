@@ -0,0 +1,100 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from modules.llm_scheduler import LLMDeadlineExceeded, LLMQueueFull, LLMScheduler
+
+class FakeLLM:
+    """Records call order; the "gate" prompt holds its worker until released."""
+
+    def __init__(self):
+        self.calls = []
+        self.gate = threading.Event()
+
+    async def __call__(self, prompt: str, model: str) -> str:
+        self.calls.append(prompt)
+        if prompt == "gate":
+            await asyncio.to_thread(self.gate.wait, 5)
+        return f"answer:{prompt}"
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.005)
+
+def blocked_scheduler(**kwargs):
+    """Scheduler with one worker busy on the gate prompt, so later jobs queue."""
+    llm = FakeLLM()
+    scheduler = LLMScheduler(llm, max_concurrency=1, **kwargs)
+    gate = scheduler.submit("gate", "m", "batch")
+    wait_for(lambda: llm.calls == ["gate"])
+    return llm, scheduler, gate
+
+def test_interactive_jobs_run_before_batch():
+    llm, scheduler, gate = blocked_scheduler()
+    futures = [
+        scheduler.submit("b1", "m", "batch"),
+        scheduler.submit("i1", "m", "interactive"),
+        scheduler.submit("b2", "m", "batch"),
+    ]
+    wait_for(lambda: scheduler.stats()["queue_depth"] == 3)
+    llm.gate.set()
+
+    assert [f.result(2) for f in futures] == ["answer:b1", "answer:i1", "answer:b2"]
+    assert llm.calls == ["gate", "i1", "b1", "b2"]
+
+def test_identical_prompts_share_one_call():
+    llm, scheduler, gate = blocked_scheduler()
+    first = scheduler.submit("same", "m", "batch")
+    second = scheduler.submit("same", "m", "batch")
+    other_model = scheduler.submit("same", "other", "batch")
+    wait_for(lambda: scheduler.stats()["submitted"] == 4)
+    llm.gate.set()
+
+    assert first.result(2) == second.result(2) == other_model.result(2) == "answer:same"
+    assert llm.calls == ["gate", "same", "same"]
+    assert scheduler.stats()["coalesced"] == 1
+
+def test_interactive_duplicate_promotes_queued_batch_job():
+    llm, scheduler, gate = blocked_scheduler()
+    queued = [scheduler.submit("b1", "m", "batch"), scheduler.submit("b2", "m", "batch")]
+    promoted = scheduler.submit("b2", "m", "interactive")
+    wait_for(lambda: scheduler.stats()["coalesced"] == 1)
+    llm.gate.set()
+
+    assert promoted.result(2) == queued[1].result(2) == "answer:b2"
+    assert queued[0].result(2) == "answer:b1"
+    assert llm.calls == ["gate", "b2", "b1"]
+
+def test_deadline_expires_queued_job_without_calling_llm():
+    llm, scheduler, gate = blocked_scheduler()
+    late = scheduler.submit("late", "m", "interactive", timeout=0.05)
+
+    with pytest.raises(LLMDeadlineExceeded):
+        late.result(2)
+    llm.gate.set()
+    gate.result(2)
+
+    wait_for(lambda: scheduler.stats()["expired"] == 1)
+    assert "late" not in llm.calls
+    assert scheduler.stats()["queue_depth"] == 0
+
+def test_full_queue_rejects_new_prompts():
+    llm, scheduler, gate = blocked_scheduler(max_queue=1)
+    queued = scheduler.submit("a", "m", "batch")
+    rejected = scheduler.submit("b", "m", "batch")
+
+    with pytest.raises(LLMQueueFull):
+        rejected.result(2)
+    llm.gate.set()
+    assert queued.result(2) == "answer:a"
+    assert scheduler.stats()["rejected"] == 1
+
+def test_unknown_priority_is_rejected():
+    scheduler = LLMScheduler(FakeLLM())
+    with pytest.raises(ValueError):
+        scheduler.submit("x", "m", "urgent")
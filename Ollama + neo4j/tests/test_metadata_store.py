@@ -0,0 +1,102 @@
+import gzip
+import json
+
+import pytest
+
+from modules import metadata_store
+
+FILTERS = {"tier": lambda d: [d.get("enrichment_tier")]}
+
+def record(doc_id, path, tier="fast"):
+    return {"id": doc_id, "relative_path": path, "enrichment_tier": tier}
+
+@pytest.fixture
+def corpus(tmp_path):
+    path = str(tmp_path / "metadata.jsonl")
+    metadata_store.write_records(path, [record(f"id{i}", f"doc{i}.pdf", "full" if i % 2 else "fast")
+                                        for i in range(5)])
+    return path
+
+def page(path, args=None, query_string="", etag_matches=lambda etag: False, accept_encoding=""):
+    status, headers, body = metadata_store.page_records(
+        path, FILTERS, "missing", args or {}, query_string, etag_matches, accept_encoding)
+    if isinstance(body, dict):
+        return status, headers, body
+    data = b"".join(c if isinstance(c, bytes) else c.encode("utf-8") for c in body)
+    if headers.get("Content-Encoding") == "gzip":
+        data = gzip.decompress(data)
+    return status, headers, json.loads(data) if data else None
+
+# -----------------------------
+# Record storage
+# -----------------------------
+def test_replace_records_keeps_copies_that_share_an_id(tmp_path):
+    path = str(tmp_path / "metadata.jsonl")
+    metadata_store.write_records(path, [record("x", "a.pdf"), record("x", "b.pdf")])
+
+    metadata_store.replace_records(path, [record("x", "a.pdf", "full"), record("x", "b.pdf", "full")])
+
+    assert metadata_store.load_records(path) == [record("x", "a.pdf", "full"), record("x", "b.pdf", "full")]
+
+def test_replace_records_appends_new_and_drops_stale_duplicates(tmp_path):
+    path = str(tmp_path / "metadata.jsonl")
+    metadata_store.write_records(path, [record("x", "a.pdf"), record("y", "b.pdf"), record("x", "a.pdf")])
+
+    metadata_store.replace_record(path, record("x", "a.pdf", "full"))
+    metadata_store.replace_record(path, record("z", "c.pdf"))
+
+    assert metadata_store.load_records(path) == [
+        record("x", "a.pdf", "full"), record("y", "b.pdf"), record("z", "c.pdf")]
+
+def test_iter_records_resumes_from_offset(corpus):
+    offsets = [offset for offset, _ in metadata_store.iter_records(corpus)]
+    resumed = [r["id"] for _, r in metadata_store.iter_records(corpus, offsets[1])]
+
+    assert resumed == ["id2", "id3", "id4"]
+    assert metadata_store.is_record_boundary(corpus, offsets[1])
+    assert not metadata_store.is_record_boundary(corpus, offsets[1] - 1)
+
+# -----------------------------
+# Paged views
+# -----------------------------
+def test_cursor_pages_through_every_record(corpus):
+    status, _, first = page(corpus, {"limit": "2"})
+    _, _, second = page(corpus, {"limit": "2", "cursor": first["next_cursor"]})
+    _, _, last = page(corpus, {"limit": "2", "cursor": second["next_cursor"]})
+
+    assert status == 200
+    assert [r["id"] for p in (first, second, last) for r in p["items"]] == [f"id{i}" for i in range(5)]
+    assert last["next_cursor"] is None
+
+def test_filters_and_projection(corpus):
+    _, _, body = page(corpus, {"tier": "FULL", "fields": "id"})
+
+    assert body == {"items": [{"id": "id1"}, {"id": "id3"}], "count": 2, "next_cursor": None}
+
+def test_cursor_from_an_older_file_version_is_gone(corpus):
+    _, _, first = page(corpus, {"limit": "2"})
+    metadata_store.replace_record(corpus, record("id9", "doc9.pdf"))
+
+    assert page(corpus, {"limit": "2", "cursor": first["next_cursor"]})[0] == 410
+
+def test_cursor_off_a_record_boundary_is_rejected(corpus):
+    cursor = metadata_store.encode_cursor(3, metadata_store.file_version(corpus))
+
+    assert page(corpus, {"cursor": cursor})[0] == 400
+    assert page(corpus, {"cursor": "not-a-cursor"})[0] == 400
+    assert page(corpus, {"limit": "many"})[0] == 400
+
+def test_etag_differs_per_encoding_and_matches_give_304(corpus):
+    _, plain, _ = page(corpus, query_string="limit=2")
+    _, zipped, body = page(corpus, query_string="limit=2", accept_encoding="gzip, br")
+
+    assert plain["ETag"] != zipped["ETag"]
+    assert zipped["Content-Encoding"] == "gzip" and body["count"] == 5
+    etag = zipped["ETag"].strip('"')
+    status, headers, _ = page(corpus, query_string="limit=2", accept_encoding="gzip",
+                              etag_matches=lambda candidate: candidate == etag)
+    assert status == 304
+    assert headers["Vary"] == "Accept-Encoding"
+
+def test_missing_file_is_404(tmp_path):
+    assert page(str(tmp_path / "none.jsonl")) == (404, {}, {"error": "missing"})
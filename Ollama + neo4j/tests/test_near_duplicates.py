@@ -0,0 +1,90 @@
+import random
+
+from modules.near_duplicates import LSHIndex, MinHash, estimate_similarity
+
+def words(seed, n=400):
+    rng = random.Random(seed)
+    return " ".join(f"w{rng.randrange(5000)}" for _ in range(n))
+
+def signature(*chunks):
+    minhash = MinHash()
+    for chunk in chunks:
+        minhash.update(chunk)
+    return minhash.signature()
+
+# -----------------------------
+# MinHash
+# -----------------------------
+def test_updates_carry_shingles_across_page_boundaries():
+    text = words(1)
+    half = len(text) // 2
+    split = text.rfind(" ", 0, half)
+
+    assert signature(text[:split], text[split:]) == signature(text)
+
+def test_merge_takes_the_per_bin_minimum_of_worker_ranges():
+    first, second = MinHash(), MinHash()
+    first.update(words(1))
+    second.update(words(2))
+    merged = MinHash()
+    merged.merge(first.mins)
+    merged.merge(second.mins)
+
+    assert merged.mins == [min(a, b) for a, b in zip(first.mins, second.mins)]
+    # Only the shingles spanning the range boundary are missing
+    assert estimate_similarity(merged.signature(), signature(words(1) + " " + words(2))) > 0.95
+
+def test_similarity_separates_revisions_from_unrelated_text():
+    original = words(1)
+    revision = original + " " + words(2, 20)
+
+    assert estimate_similarity(signature(original), signature(revision)) > 0.8
+    assert estimate_similarity(signature(original), signature(words(3))) < 0.2
+
+def test_text_without_shingles_has_no_signature():
+    assert signature("too short") is None
+
+# -----------------------------
+# LSH index
+# -----------------------------
+def test_query_finds_the_closest_match_but_not_itself(tmp_path):
+    index = LSHIndex(str(tmp_path / "lsh.json"))
+    index.add("a", "a.pdf", signature(words(1)))
+    index.add("b", "b.pdf", signature(words(2)))
+
+    match = index.query(signature(words(1) + " extra words at the end"), exclude_id="new")
+    assert match["id"] == "a" and match["filename"] == "a.pdf"
+    assert index.query(signature(words(1)), exclude_id="a") is None
+    assert index.query(signature(words(3))) is None
+
+def test_remove_drops_the_document_and_its_buckets(tmp_path):
+    index = LSHIndex(str(tmp_path / "lsh.json"))
+    sig = signature(words(1))
+    index.add("a", "a.pdf", sig)
+    index.remove("a")
+    index.remove("missing")
+
+    assert index.query(sig) is None
+    assert index.docs == {} and index.buckets == {}
+
+def test_re_adding_a_document_replaces_its_signature(tmp_path):
+    index = LSHIndex(str(tmp_path / "lsh.json"))
+    index.add("a", "a.pdf", signature(words(1)))
+    index.add("a", "a.pdf", signature(words(2)))
+
+    assert index.query(signature(words(1))) is None
+    assert index.query(signature(words(2)))["id"] == "a"
+
+def test_maybe_save_batches_writes_and_reload_restores_buckets(tmp_path):
+    path = tmp_path / "lsh.json"
+    index = LSHIndex(str(path), save_every=2, save_interval_sec=3600)
+    index.add("a", "a.pdf", signature(words(1)))
+    index.maybe_save()
+    assert not path.exists()
+
+    index.add("b", "b.pdf", signature(words(2)))
+    index.maybe_save()
+    assert path.exists()
+
+    reloaded = LSHIndex(str(path))
+    assert reloaded.query(signature(words(2)))["id"] == "b"
@@ -0,0 +1,163 @@
+import asyncio
+import random
+
+import pytest
+
+from modules.similarity import DocumentSimilarity, document_features
+
+class FakeTx:
+    def __init__(self, db):
+        self.db = db
+
+    def run(self, query, params=None):
+        if "SIMILAR_TO" in query and params and "rows" in params:
+            for row in params["rows"]:
+                self.db.edges[row["id"]] = [(n["id"], n["score"]) for n in row["neighbors"]]
+        elif "DELETE r" in query:
+            self.db.edges.clear()
+        return self
+
+    def consume(self):
+        return None
+
+class FakeDB:
+    """Feature edges to load from the graph; SIMILAR_TO writes land in `edges`."""
+
+    def __init__(self, feature_rows=()):
+        self.feature_rows = list(feature_rows)
+        self.edges = {}
+
+    def run_read(self, query, **params):
+        return self.feature_rows if "OPTIONAL MATCH" in query else []
+
+    def write(self, work, *args):
+        return work(FakeTx(self), *args)
+
+class FakeAsyncTx(FakeTx):
+    async def run(self, query, params=None):
+        return super().run(query, params)
+
+    async def consume(self):
+        return None
+
+class FakeAsyncDB(FakeDB):
+    async def write(self, work, *args):
+        await asyncio.sleep(0)  # let concurrent patches interleave
+        return await work(FakeAsyncTx(self), *args)
+
+def doc(doc_id, industries=(), technologies=(), partners=(), client=None):
+    return {
+        "id": doc_id,
+        "industry_tags": {"industries": list(industries)},
+        "entities": {"technologies": list(technologies), "partners": list(partners)},
+        "tags": {"client": client or "Unknown"},
+    }
+
+def test_document_features_cover_every_graph_feature():
+    feats = document_features(doc("a", ["Retail"], ["Kubernetes"], ["Microsoft"], client="Nike"))
+
+    assert feats == {"Industry:Retail", "Technology:Kubernetes", "Partner:Microsoft", "Client:Nike"}
+
+def test_clients_and_organisations_named_in_the_text_are_features():
+    record = doc("a")
+    record["entities"].update({"clients": ["Nike"], "organizations": ["Globex"]})
+
+    assert document_features(record) == {"Client:Nike", "Organization:Globex"}
+
+def test_scores_are_idf_weighted_jaccard():
+    sim = DocumentSimilarity(FakeDB())
+    sim.add_document(doc("a", ["Retail"], ["Kubernetes"]))
+    sim.add_document(doc("b", ["Retail"], ["Kubernetes"]))
+    sim.add_document(doc("c", ["Retail"], ["SAP"]))
+
+    scores = sim._scores("a")
+    assert scores["b"] == 1.0
+    assert 0 < scores["c"] < 1.0
+
+def test_features_on_most_documents_are_ignored_in_large_corpora():
+    sim = DocumentSimilarity(FakeDB())
+    for i in range(20):
+        sim.add_document(doc(f"d{i}", ["Technology"], [f"tech{i}"]))
+
+    assert sim._idf("Industry:Technology") == 0.0
+    assert sim._scores("d0") == {}
+    assert sim.neighbors["d19"] == []
+
+def test_incremental_updates_keep_lists_consistent_with_the_latest_scores():
+    rng = random.Random(7)
+    sim = DocumentSimilarity(FakeDB(), top_k=3)
+    for i in range(40):
+        sim.add_document(doc(f"d{i}",
+                             rng.sample(["Retail", "Banking", "Energy", "Health"], 1),
+                             rng.sample([f"tech{t}" for t in range(12)], 3),
+                             rng.sample([f"partner{p}" for p in range(6)], 1)))
+    # Re-enrichment changes a document's features in place
+    sim.add_document(doc("d3", ["Energy"], ["tech1", "tech2"]))
+
+    # The patched document is scored exactly; older lists keep their
+    # (drifting) IDF scores but every mention of it carries the new one
+    scores = sim._scores("d3")
+    assert sim.neighbors["d3"] == sim._top_k(scores)
+    for other, neighbours in sim.neighbors.items():
+        for n, score in neighbours:
+            if n == "d3":
+                assert score == scores[other]
+        if other in scores and all(n != "d3" for n, _ in neighbours):
+            assert len(neighbours) == sim.top_k and neighbours[-1][1] >= scores[other]
+
+def test_writes_patch_only_affected_documents_and_match_memory():
+    db = FakeDB()
+    sim = DocumentSimilarity(db)
+    sim.add_document(doc("a", technologies=["Kubernetes"]))
+    sim.add_document(doc("b", technologies=["Kubernetes"]))
+    sim.add_document(doc("c", technologies=["SAP"]))
+
+    assert db.edges["a"] == [("b", 1.0)] and db.edges["b"] == [("a", 1.0)]
+    assert db.edges["c"] == []
+
+    # "b" moves from "a" to "c": all three lists change and are rewritten
+    sim.add_document(doc("b", technologies=["SAP"]))
+    assert db.edges == sim.neighbors == {"a": [], "b": [("c", 1.0)], "c": [("b", 1.0)]}
+
+def test_unaffected_documents_are_not_rewritten():
+    db = FakeDB()
+    sim = DocumentSimilarity(db)
+    sim.add_document(doc("a", technologies=["Kubernetes"]))
+    sim.add_document(doc("b", technologies=["SAP"]))
+    db.edges.clear()
+
+    sim.add_document(doc("c", technologies=["Kubernetes"]))
+    assert db.edges == {"c": [("a", 1.0)], "a": [("c", 1.0)]}
+
+def test_rebuild_reloads_features_from_the_graph():
+    db = FakeDB([
+        {"id": "a", "rel": "MENTIONS_TECHNOLOGY", "name": "Kubernetes"},
+        {"id": "b", "rel": "MENTIONS_TECHNOLOGY", "name": "Kubernetes"},
+        {"id": "c", "rel": None, "name": None},
+    ])
+    sim = DocumentSimilarity(db)
+
+    assert sim.rebuild() == 3
+    assert db.edges == {"a": [("b", 1.0)], "b": [("a", 1.0)], "c": []}
+
+@pytest.mark.parametrize("top_k", [1, 2])
+def test_neighbour_lists_are_capped_at_top_k(top_k):
+    sim = DocumentSimilarity(FakeDB(), top_k=top_k)
+    for i in range(4):
+        sim.add_document(doc(f"d{i}", technologies=["Kubernetes", f"t{i}"]))
+
+    assert all(len(n) <= top_k for n in sim.neighbors.values())
+
+def test_async_patches_write_the_same_edges_in_order():
+    sync_db, async_db = FakeDB(), FakeAsyncDB()
+    docs = [doc(f"d{i}", technologies=["Kubernetes", f"t{i % 3}"]) for i in range(6)]
+    sync_sim, async_sim = DocumentSimilarity(sync_db), DocumentSimilarity(async_db)
+    for d in docs:
+        sync_sim.add_document(d)
+
+    async def patch_concurrently():
+        await asyncio.gather(*(async_sim.add_document_async(d, async_db) for d in docs))
+    asyncio.run(patch_concurrently())
+
+    assert async_sim.neighbors == sync_sim.neighbors
+    assert async_db.edges == async_sim.neighbors